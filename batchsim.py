@@ -0,0 +1,198 @@
+# batchsim.py - vectorized batch simulator (requires NumPy)
+#
+# Plays many games in lockstep: wall bitplanes, pawn cells and wall counts for N games live
+# in NumPy arrays, distance maps for every game are relaxed together, and one policy step is
+# applied across the whole batch each ply. The policy mirrors mcts.playout(): step along the
+# shortest path, or place a wall when it gains more than a step would. To keep a ply to a few
+# batched searches, only the walls cutting the opponent's next two steps are considered.
+# With epsilon > 0 a random pawn step is played instead with that probability.
+# The index tables are built for the standard GRID_SIZE board only.
+import numpy as np
+from game_state import GRID_SIZE, CELL_COUNT, CELL_POS, EDGE_BLOCKERS, WALL_SLOTS, STEP_OFFSETS, newGame
+
+MAX_PLIES = 300  # Games still running after this many plies are scored as draws.
+WALL_BITS = 2 * CELL_COUNT
+PAD_BIT = WALL_BITS  # Extra always-empty column, used to pad the index tables
+INF = 10000  # Unreachable; twice this still fits the int16 distance maps
+GOAL_ROWS = np.array([0, GRID_SIZE - 1])
+CANDIDATES = 4  # Candidate wall bits per game and ply
+
+
+def _bits(mask):
+    return [bit for bit in range(WALL_BITS) if mask >> bit & 1]
+
+
+def _padded(rows, width):
+    return np.array([row + [PAD_BIT] * (width - len(row)) for row in rows], dtype=np.intp)
+
+
+CELL_ROW = np.array([row for row, _ in CELL_POS])
+# NEXT_CELL[cell, direction] -> neighbouring cell, or CELL_COUNT (an INF column) off the board.
+NEXT_CELL = np.array([[(r + dr) * GRID_SIZE + c + dc if 0 <= r + dr < GRID_SIZE and 0 <= c + dc < GRID_SIZE
+                       else CELL_COUNT for dr, dc in STEP_OFFSETS] for r, c in CELL_POS], dtype=np.intp)
+ON_BOARD = NEXT_CELL < CELL_COUNT
+# STEP_BLOCKERS[cell, direction] -> the (up to two) wall bits blocking that step.
+STEP_BLOCKERS = np.stack([_padded([_bits(mask) for mask in blockers], 2) for blockers in EDGE_BLOCKERS])
+SLOT_BIT = np.array([bit.bit_length() - 1 for _, _, _, bit, _ in WALL_SLOTS], dtype=np.intp)
+SLOT_CONFLICTS = _padded([_bits(conflicts) for *_, conflicts in WALL_SLOTS], 4)
+BIT_SLOT = np.full(WALL_BITS + 1, -1, dtype=np.intp)
+BIT_SLOT[SLOT_BIT] = np.arange(len(WALL_SLOTS))
+
+
+def blockedSteps(walls):
+    # walls: (M, WALL_BITS + 1) bool -> (M, CELL_COUNT, 4) bool, True where the step is walled off.
+    return walls[:, STEP_BLOCKERS].any(axis=3)
+
+
+def distanceMaps(walls, goal_rows, blocked=None):
+    # Breadth-first distances to each game's goal row, relaxed for every game at once by
+    # shifting the whole (M, GRID_SIZE, GRID_SIZE) grid one step in each direction.
+    # Returns (M, CELL_COUNT + 1); the last column and unreachable cells hold INF.
+    if blocked is None:
+        blocked = blockedSteps(walls)
+    count = len(walls)
+    up, down, left, right = np.where(blocked, INF, 1).astype(np.int16).reshape(
+        count, GRID_SIZE, GRID_SIZE, 4).transpose(3, 0, 1, 2)
+    grid = np.full((count, GRID_SIZE, GRID_SIZE), INF, dtype=np.int16)
+    grid[np.arange(count), goal_rows] = 0
+    for _ in range(CELL_COUNT):
+        updated = grid.copy()
+        np.minimum(updated[:, 1:], grid[:, :-1] + up[:, 1:], out=updated[:, 1:])
+        np.minimum(updated[:, :-1], grid[:, 1:] + down[:, :-1], out=updated[:, :-1])
+        np.minimum(updated[:, :, 1:], grid[:, :, :-1] + left[:, :, 1:], out=updated[:, :, 1:])
+        np.minimum(updated[:, :, :-1], grid[:, :, 1:] + right[:, :, :-1], out=updated[:, :, :-1])
+        if np.array_equal(updated, grid):
+            break
+        grid = updated
+    distances = np.full((count, CELL_COUNT + 1), INF, dtype=np.int16)
+    distances[:, :CELL_COUNT] = grid.reshape(count, CELL_COUNT)
+    return distances
+
+
+class BatchSimulator:
+    def __init__(self, states, epsilon=0.0, seed=None):
+        count = len(states)
+        self.epsilon = epsilon
+        self.rng = np.random.default_rng(seed)
+        self.walls = np.zeros((count, WALL_BITS + 1), dtype=bool)
+        self.cells = np.zeros((count, 2), dtype=np.intp)  # pawn cell of player 1, player 2
+        self.wallsLeft = np.zeros((count, 2), dtype=np.intp)
+        self.turn = np.zeros(count, dtype=np.intp)  # 0 = player 1 to move
+        self.winner = np.zeros(count, dtype=np.intp)  # 0 while running or drawn
+        self.plies = np.zeros(count, dtype=np.intp)
+        for i, state in enumerate(states):
+            if state.size != GRID_SIZE:
+                raise ValueError(f"Batch simulation needs {GRID_SIZE}x{GRID_SIZE} boards, got {state.size}x{state.size}")
+            self.walls[i, _bits(state.walls)] = True
+            self.cells[i] = state.player1_cell, state.player2_cell
+            self.wallsLeft[i] = state.wallsRemaining(1), state.wallsRemaining(2)
+            self.turn[i] = state.player_turn - 1
+            self.winner[i] = state.getWinner() or 0
+
+    @classmethod
+    def newGames(cls, count, epsilon=0.0, seed=None):
+        return cls([newGame()] * count, epsilon, seed)
+
+    def running(self):
+        return np.flatnonzero(self.winner == 0)
+
+    def _pickStep(self, distances, blocked, cells, explore=None):
+        # Random step among those that shorten the path, or any open step where explore is set.
+        rows = np.arange(len(cells))
+        open_steps = ON_BOARD[cells] & ~blocked[rows, cells]
+        shortening = open_steps & (distances[rows[:, None], NEXT_CELL[cells]] == distances[rows, cells][:, None] - 1)
+        if explore is not None:
+            shortening[explore] = open_steps[explore]
+        return np.argmax(shortening + self.rng.random(shortening.shape) * 0.5, axis=1)
+
+    def _wallChoice(self, games, walls, blocked, distances, mover, own, opp):
+        # Best candidate wall bit per game and its gain over not placing it; gain is -inf
+        # where no candidate is legal.
+        count = len(games)
+        rows = np.arange(count)
+        opp_cell = self.cells[games, 1 - mover]
+        first = self._pickStep(distances[1], blocked, opp_cell)
+        second_cell = NEXT_CELL[opp_cell, first]
+        second = self._pickStep(distances[1], blocked, second_cell)
+        candidates = np.concatenate([STEP_BLOCKERS[opp_cell, first], STEP_BLOCKERS[second_cell, second]], axis=1)
+        slots = BIT_SLOT[candidates]
+        legal = (slots >= 0) & ~walls[rows[:, None, None], SLOT_CONFLICTS[slots]].any(axis=2)
+
+        # Distance maps with each conflict-free candidate added, for both players.
+        game_of, which = np.nonzero(legal)
+        trial = walls[game_of]
+        trial[np.arange(len(game_of)), candidates[game_of, which]] = True
+        trial_blocked = blockedSteps(trial)
+        own_after = np.full((count, CANDIDATES), INF, dtype=np.int16)
+        opp_after = np.full((count, CANDIDATES), INF, dtype=np.int16)
+        trial_rows = np.arange(len(game_of))
+        own_after[game_of, which] = distanceMaps(trial, GOAL_ROWS[mover[game_of]], trial_blocked)[
+            trial_rows, self.cells[games[game_of], mover[game_of]]]
+        opp_after[game_of, which] = distanceMaps(trial, GOAL_ROWS[1 - mover[game_of]], trial_blocked)[
+            trial_rows, opp_cell[game_of]]
+        legal &= (own_after < INF) & (opp_after < INF)
+        # Same scale as mcts.heuristic(): path difference plus 0.1 per wall in hand.
+        gain = np.where(legal, (opp_after - opp[:, None]) - (own_after - own[:, None]) - 0.1, -np.inf)
+        gain += self.rng.random(gain.shape) * 0.01  # Random tie-break
+        best = np.argmax(gain, axis=1)
+        return candidates[rows, best], gain[rows, best]
+
+    def step(self):
+        # Plays one ply in every running game; returns the number of games that moved.
+        games = self.running()
+        if len(games) == 0:
+            return 0
+        count = len(games)
+        rows = np.arange(count)
+        mover = self.turn[games]
+        walls = self.walls[games]
+        blocked = blockedSteps(walls)
+        own_map = distanceMaps(walls, GOAL_ROWS[mover], blocked)
+        opp_map = distanceMaps(walls, GOAL_ROWS[1 - mover], blocked)
+        own_cell = self.cells[games, mover]
+        own = own_map[rows, own_cell]
+        opp = opp_map[rows, self.cells[games, 1 - mover]]
+
+        explore = self.rng.random(count) < self.epsilon if self.epsilon else None
+        direction = self._pickStep(own_map, blocked, own_cell, explore)
+        place = np.zeros(count, dtype=bool)
+        wall_bit = np.zeros(count, dtype=np.intp)
+        can_wall = np.flatnonzero(self.wallsLeft[games, mover] > 0)
+        if len(can_wall):
+            bits, gain = self._wallChoice(games[can_wall], walls[can_wall], blocked[can_wall],
+                                          (own_map[can_wall], opp_map[can_wall]), mover[can_wall],
+                                          own[can_wall], opp[can_wall])
+            # A step along the shortest path gains exactly 1.
+            place[can_wall] = gain > 1
+            wall_bit[can_wall] = bits
+        if explore is not None:
+            place &= ~explore
+
+        walled = games[place]
+        self.walls[walled, wall_bit[place]] = True
+        self.wallsLeft[walled, mover[place]] -= 1
+        stepped = games[~place]
+        new_cells = NEXT_CELL[own_cell[~place], direction[~place]]
+        self.cells[stepped, mover[~place]] = new_cells
+        arrived = CELL_ROW[new_cells] == GOAL_ROWS[mover[~place]]
+        self.winner[stepped[arrived]] = mover[~place][arrived] + 1
+        self.turn[games] = 1 - mover
+        self.plies[games] += 1
+        return count
+
+    def run(self, max_plies=MAX_PLIES):
+        # Plays every game to the end (or max_plies more plies); returns (winners, plies)
+        # with winner None for unfinished games.
+        for _ in range(max_plies):
+            if not self.step():
+                break
+        return [int(winner) or None for winner in self.winner], self.plies.tolist()
+
+
+def batchPlayouts(states, epsilon=0.0, seed=None, max_plies=MAX_PLIES):
+    # Batched counterpart of mcts.playout(): [(winner, plies)] for each state; the states
+    # themselves are not modified.
+    if not states:
+        return []
+    winners, plies = BatchSimulator(states, epsilon, seed).run(max_plies)
+    return list(zip(winners, plies))
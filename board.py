@@ -3,13 +3,37 @@ import pygame
 from constants import SCREEN_WIDTH, SCREEN_HEIGHT, GRID_SIZE, CELL_SIZE, TEXT_COLOR, BOARD_COLOR, GRID_COLOR, PLAYER1_COLOR, PLAYER2_COLOR, BARRIER_COLOR
 from game_state import QuoridorState
 
-def draw_board(screen, barriers, player1_pos, player2_pos, player1_barriers, player2_barriers, font):
-    # Clear screen
-    screen.fill(BOARD_COLOR)
+UI_BAR_HEIGHT = 50
+BARRIER_THICKNESS = 10
+
+def _drawBackground(surface):
+    # Board color, UI bar (above the board) and the grid starting below the UI bar.
+    surface.fill(BOARD_COLOR)
+    pygame.draw.rect(surface, GRID_COLOR, (0, 0, SCREEN_WIDTH, UI_BAR_HEIGHT))
+    for row in range(GRID_SIZE):
+        for col in range(GRID_SIZE):
+            pygame.draw.rect(surface, BOARD_COLOR,
+                             (col * CELL_SIZE, row * CELL_SIZE + UI_BAR_HEIGHT, CELL_SIZE, CELL_SIZE), 1)
+            pygame.draw.rect(surface, GRID_COLOR,
+                             (col * CELL_SIZE, row * CELL_SIZE + UI_BAR_HEIGHT, CELL_SIZE, CELL_SIZE), 2)
+
+def _wallRect(wall):
+    row, col, orientation = wall
+    if orientation == 'horizontal':
+        return pygame.Rect(col * CELL_SIZE, row * CELL_SIZE + UI_BAR_HEIGHT - BARRIER_THICKNESS // 2,
+                           CELL_SIZE * 2, BARRIER_THICKNESS)
+    return pygame.Rect(col * CELL_SIZE - BARRIER_THICKNESS // 2, row * CELL_SIZE + UI_BAR_HEIGHT,
+                       BARRIER_THICKNESS, CELL_SIZE * 2)
 
-    # Draw UI bar (above the board)
-    ui_bar_height = 50
-    pygame.draw.rect(screen, GRID_COLOR, (0, 0, SCREEN_WIDTH, ui_bar_height))
+def _cellRect(pos):
+    return pygame.Rect(pos[1] * CELL_SIZE, pos[0] * CELL_SIZE + UI_BAR_HEIGHT, CELL_SIZE, CELL_SIZE)
+
+def _drawPlayer(surface, color, pos):
+    pygame.draw.circle(surface, color, _cellRect(pos).center, CELL_SIZE // 3)
+
+def draw_board(screen, barriers, player1_pos, player2_pos, player1_barriers, player2_barriers, font):
+    # Full redraw of one frame. BoardRenderer below does the same incrementally.
+    _drawBackground(screen)
 
     # Draw text inside UI bar
     p1_text = font.render(f"P1 Barriers: {player1_barriers}", True, TEXT_COLOR)
@@ -18,38 +42,105 @@ def draw_board(screen, barriers, player1_pos, player2_pos, player1_barriers, pla
     screen.blit(p1_text, (20, 15))  # Left side
     screen.blit(p2_text, (SCREEN_WIDTH - 200, 15))  # Right side
 
-    # Draw the grid starting below the UI bar
-    for row in range(GRID_SIZE):
-        for col in range(GRID_SIZE):
-            pygame.draw.rect(screen, BOARD_COLOR,
-                             (col * CELL_SIZE, row * CELL_SIZE + ui_bar_height, CELL_SIZE, CELL_SIZE), 1)
-            pygame.draw.rect(screen, GRID_COLOR,
-                             (col * CELL_SIZE, row * CELL_SIZE + ui_bar_height, CELL_SIZE, CELL_SIZE), 2)
-
     # Draw barriers
-    barrier_thickness = 10
     for wall in barriers:
-        row, col, orientation = wall
-        if orientation == 'horizontal':
-            pygame.draw.rect(screen, BARRIER_COLOR,
-                             (col * CELL_SIZE,
-                              row * CELL_SIZE + ui_bar_height - barrier_thickness // 2,
-                              CELL_SIZE * 2,
-                              barrier_thickness))
-        elif orientation == 'vertical':
-            pygame.draw.rect(screen, BARRIER_COLOR,
-                             (col * CELL_SIZE - barrier_thickness // 2,
-                              row * CELL_SIZE + ui_bar_height,
-                              barrier_thickness,
-                              CELL_SIZE * 2))
+        pygame.draw.rect(screen, BARRIER_COLOR, _wallRect(wall))
 
     # Draw players
-    pygame.draw.circle(screen, PLAYER1_COLOR, (player1_pos[1] * CELL_SIZE + CELL_SIZE // 2,
-                                      player1_pos[0] * CELL_SIZE + CELL_SIZE // 2 + ui_bar_height),
-                       CELL_SIZE // 3)
-    pygame.draw.circle(screen, PLAYER2_COLOR, (player2_pos[1] * CELL_SIZE + CELL_SIZE // 2,
-                                       player2_pos[0] * CELL_SIZE + CELL_SIZE // 2 + ui_bar_height),
-                       CELL_SIZE // 3)
+    _drawPlayer(screen, PLAYER1_COLOR, player1_pos)
+    _drawPlayer(screen, PLAYER2_COLOR, player2_pos)
+
+class BoardRenderer:
+    # Keeps the static grid on a surface built once, the walls on a layer that only gets
+    # new walls drawn onto it, and text surfaces that are re-rendered only when their text
+    # changes. render() repaints just the regions that changed since the previous frame and
+    # returns them for pygame.display.update(); an idle frame returns no rects at all.
+    def __init__(self, screen, font):
+        self.screen = screen
+        self.font = font
+        self.background = pygame.Surface(screen.get_size())
+        _drawBackground(self.background)
+        self.wallLayer = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
+        self.drawnWalls = set()
+        self.countText = {}  # player -> (count, surface)
+        self.messageText = {}  # (message, color) -> surface, for the messages on screen
+        self.frame = None  # (player1_pos, player2_pos, counts, message rects) last painted
+
+    def invalidate(self):
+        # Force a full repaint, e.g. after the window was exposed again.
+        self.frame = None
+
+    def _counts(self, player1_barriers, player2_barriers):
+        surfaces = []
+        for player, count in ((1, player1_barriers), (2, player2_barriers)):
+            cached = self.countText.get(player)
+            if cached is None or cached[0] != count:
+                cached = (count, self.font.render(f"P{player} Barriers: {count}", True, TEXT_COLOR))
+                self.countText[player] = cached
+            surfaces.append(cached[1])
+        return surfaces
+
+    def _messages(self, messages):
+        # Returns the surfaces with their rects, and whether any text differs from last frame.
+        texts = {}
+        placed = []
+        for message, color, position in messages:
+            surface = self.messageText.get((message, color)) or self.font.render(message, True, color)
+            texts[(message, color)] = surface
+            placed.append((surface, surface.get_rect(topleft=position)))
+        changed = texts.keys() != self.messageText.keys()
+        self.messageText = texts
+        return placed, changed
+
+    def _updateWalls(self, barriers):
+        # Draws new walls onto the wall layer and returns their rects, or None if the
+        # layer had to be rebuilt because a wall was taken back.
+        walls = set(barriers)
+        rebuilt = not self.drawnWalls <= walls
+        if rebuilt:
+            self.wallLayer.fill((0, 0, 0, 0))
+            self.drawnWalls = set()
+        added = walls - self.drawnWalls
+        for wall in added:
+            pygame.draw.rect(self.wallLayer, BARRIER_COLOR, _wallRect(wall))
+        self.drawnWalls = walls
+        return None if rebuilt else [_wallRect(wall) for wall in added]
+
+    def render(self, barriers, player1_pos, player2_pos, player1_barriers, player2_barriers, messages=()):
+        # messages: (text, color, position) overlays drawn on top of the board.
+        wall_rects = self._updateWalls(barriers)
+        counts = (player1_barriers, player2_barriers)
+        count_surfaces = self._counts(player1_barriers, player2_barriers)
+        placed, texts_changed = self._messages(messages)
+        message_rects = [rect for _, rect in placed]
+
+        if self.frame is None or wall_rects is None:
+            dirty = [self.screen.get_rect()]
+        else:
+            dirty = wall_rects
+            old_p1, old_p2, old_counts, old_message_rects = self.frame
+            if player1_pos != old_p1:
+                dirty += [_cellRect(old_p1), _cellRect(player1_pos)]
+            if player2_pos != old_p2:
+                dirty += [_cellRect(old_p2), _cellRect(player2_pos)]
+            if counts != old_counts:
+                dirty.append(pygame.Rect(0, 0, SCREEN_WIDTH, UI_BAR_HEIGHT))
+            if texts_changed or message_rects != old_message_rects:
+                dirty += old_message_rects + message_rects
+        self.frame = (player1_pos, player2_pos, counts, message_rects)
+
+        for rect in dirty:
+            self.screen.set_clip(rect)
+            self.screen.blit(self.background, rect, rect)
+            self.screen.blit(count_surfaces[0], (20, 15))  # Left side
+            self.screen.blit(count_surfaces[1], (SCREEN_WIDTH - 200, 15))  # Right side
+            self.screen.blit(self.wallLayer, rect, rect)
+            _drawPlayer(self.screen, PLAYER1_COLOR, player1_pos)
+            _drawPlayer(self.screen, PLAYER2_COLOR, player2_pos)
+            for surface, message_rect in placed:
+                self.screen.blit(surface, message_rect)
+        self.screen.set_clip(None)
+        return dirty
 
 def getGridPos(mousePos):
     x, y = mousePos
@@ -69,39 +160,17 @@ def placeBarrierAtClick(mousePos, orientation, state):
         return False
 
     # Create a single-tuple wall representation.
-    if orientation == 'horizontal' and col < GRID_SIZE - 1:
-        new_wall = (row, col, 'horizontal')
-    elif orientation == 'vertical' and row < GRID_SIZE - 1:
-        new_wall = (row, col, 'vertical')
-    else:
-        # Invalid placement (e.g. out of bounds)
-        return False
+    new_wall = (row, col, orientation)
 
-    # Prevent overlapping: check if any wall already occupies that cell.
-    if any(b[:2] == new_wall[:2] for b in state.barriers):
-        print("Invalid wall placement! Walls cannot overlap.")
+    # Prevent overlapping, crossing and path-blocking walls.
+    if not state.isBarrierPlacementValid((row, col), orientation):
+        print("Invalid wall placement! Walls cannot overlap, cross or block a path.")
         return False
 
-    # Backup the current barriers.
-    original_barriers = state.barriers.copy()
-
-    # Add the new wall.
-    state.barriers.append(new_wall)
+    # Successful placement: push() deducts a barrier and switches turn.
+    state.push(("barrier", (row, col), orientation))
     print(f"Wall placed at {new_wall}")
-
-    # Check for path blockage.
-    if not state.is_path_blocked():
-        # Successful placement: deduct a barrier from the current player.
-        if state.player_turn == 1:
-            state.player1_barriers -= 1
-        else:
-            state.player2_barriers -= 1
-        return True
-    else:
-        # Revert if the placement blocks a path.
-        state.barriers = original_barriers
-        print("Wall placement blocked! Path must remain open.")
-        return False
+    return True
     
 def barriers_remainig(screen, font, player1_barriers, player2_barriers):
     
@@ -0,0 +1,149 @@
+# book.py - opening book stored as a memory-mapped, hash-indexed binary file
+#
+# File layout (little endian):
+#   header   b"QBK1", uint32 entry count
+#   index    2**INDEX_BITS + 1 uint32 entry offsets, one bucket per top INDEX_BITS of the key
+#   entries  (uint64 Zobrist key, uint16 move code) sorted by key
+# Readers mmap the file read-only, so opening costs nothing up front and every process that
+# uses the book shares the same page-cache pages. Build one with
+#   python book.py --depth 4 --width 3 --time-ms 5000 --workers 8
+import mmap
+import os
+import struct
+from game_state import GRID_SIZE, QuoridorState, encodeMove, decodeMove
+
+MAGIC = b"QBK1"
+HEADER = struct.Struct("<4sI")
+INDEX_BITS = 12
+INDEX = struct.Struct(f"<{(1 << INDEX_BITS) + 1}I")
+ENTRY = struct.Struct("<QH")
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+
+
+class OpeningBook:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an opening book")
+        self._entries = HEADER.size + INDEX.size
+
+    def __len__(self):
+        return self.count
+
+    def _bucket(self, bucket):
+        return struct.unpack_from("<2I", self._map, HEADER.size + 4 * bucket)
+
+    def lookupCode(self, key):
+        # Binary search inside the key's bucket; returns the move code or None.
+        lo, hi = self._bucket(key >> (64 - INDEX_BITS))
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key, code = ENTRY.unpack_from(self._map, self._entries + mid * ENTRY.size)
+            if mid_key == key:
+                return code
+            if mid_key < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def lookup(self, state):
+        # The stored move is checked for legality, so a key collision cannot play an illegal move.
+        # Books are built on the standard board only.
+        if state.size != GRID_SIZE:
+            return None
+        code = self.lookupCode(state.zobrist)
+        if code is None:
+            return None
+        move = decodeMove(code, state)
+        return move if move in state.getLegalMoves() else None
+
+    def close(self):
+        self._map.close()
+
+
+def writeBook(path, entries):
+    # entries: {Zobrist key: move code}
+    keys = sorted(entries)
+    index = [0] * ((1 << INDEX_BITS) + 1)
+    for key in keys:
+        index[(key >> (64 - INDEX_BITS)) + 1] += 1
+    for bucket in range(1, len(index)):
+        index[bucket] += index[bucket - 1]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(keys)))
+        f.write(INDEX.pack(*index))
+        for key in keys:
+            f.write(ENTRY.pack(key, entries[key]))
+    # Replace atomically so readers never map a half-written file.
+    os.replace(tmp_path, path)
+
+
+_defaultBook = None
+_defaultBookLoaded = False
+
+
+def defaultBook():
+    # The book next to this module, opened on first use; None if it has not been built.
+    global _defaultBook, _defaultBookLoaded
+    if not _defaultBookLoaded:
+        _defaultBookLoaded = True
+        if os.path.exists(DEFAULT_PATH):
+            _defaultBook = OpeningBook(DEFAULT_PATH)
+    return _defaultBook
+
+
+def _bookSearch(state, time_limit_ms):
+    from mcts import MCTS_Search
+    return encodeMove(MCTS_Search(state, ai_player=state.player_turn, time_limit_ms=time_limit_ms, useBook=False))
+
+
+def buildBook(path=DEFAULT_PATH, depth=4, width=3, time_limit_ms=5000, workers=1):
+    # Searches every position reachable from the start within `depth` plies when each side
+    # plays one of its `width` best moves by heuristic, and stores the searched best move.
+    from concurrent.futures import ProcessPoolExecutor
+    from mcts import orderedMoves
+    start = QuoridorState((8, 4), (0, 4), [], 1)
+    entries = {}
+    frontier = {start.zobrist: start}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for ply in range(depth + 1):
+            states = [state for key, state in frontier.items() if key not in entries and not state.isTerminal()]
+            codes = executor.map(_bookSearch, states, [time_limit_ms] * len(states))
+            for state, code in zip(states, codes):
+                entries[state.zobrist] = code
+            if ply == depth:
+                break
+            frontier = {}
+            for state in states:
+                candidates = orderedMoves(state)[-width:]
+                book_move = decodeMove(entries[state.zobrist], state)
+                if book_move not in candidates:
+                    candidates.append(book_move)
+                for move in candidates:
+                    child = state.applyMoves(move)
+                    frontier[child.zobrist] = child
+            print(f"ply {ply}: {len(entries)} positions")
+    writeBook(path, entries)
+    return len(entries)
+
+
+def main(argv=None):
+    # mcts imports this module for defaultBook(), so the CLI's imports stay out of that path.
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the opening book")
+    parser.add_argument("--output", default=DEFAULT_PATH)
+    parser.add_argument("--depth", type=int, default=4, help="plies from the start position")
+    parser.add_argument("--width", type=int, default=3, help="moves followed per position")
+    parser.add_argument("--time-ms", type=int, default=5000, help="search budget per position")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args(argv)
+    count = buildBook(args.output, args.depth, args.width, args.time_ms, args.workers)
+    print(f"wrote {count} positions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
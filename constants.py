@@ -3,7 +3,11 @@
 STATUS_BAR_HEIGHT = 50
 SCREEN_WIDTH = 600
 GRID_SIZE = 9
+BOARD_SIZES = (9, 11, 13, 17) # Board sizes accepted in position notation
 CELL_SIZE = SCREEN_WIDTH // GRID_SIZE
+BARRIERS_PER_PLAYER = 10
+AI_TIME_LIMIT_MS = 1000 # Wall-clock budget for each AI move
+AI_ENGINE = "mcts" # "mcts" or "negamax"
 SCREEN_HEIGHT = GRID_SIZE * CELL_SIZE + STATUS_BAR_HEIGHT
 
 WHITE = (255, 255, 255) #Text color
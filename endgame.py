@@ -0,0 +1,66 @@
+# endgame.py - exact results for positions the walls no longer decide
+#
+# Pawns never block each other, so once neither side has walls left the game is a pure
+# race: the side to move wins iff its shortest path is no longer than the opponent's.
+# When only one side has walls the opponent cannot slow it down, so that side wins
+# outright if it wins the race; otherwise, with at most ENDGAME_WALLS walls left, a small
+# full-width search over every move settles the position whenever all lines are decided
+# within ENDGAME_DEPTH plies. Anything else is reported as unknown (None).
+ENDGAME_DEPTH = 2
+ENDGAME_WALLS = 2
+CACHE_LIMIT = 1 << 16
+
+_cache = {}  # Zobrist key -> winner or None
+
+
+def raceWinner(state):
+    mover = state.player_turn
+    if state.getShortestPathLength(mover) <= state.getShortestPathLength(3 - mover):
+        return mover
+    return 3 - mover
+
+
+def endgameWinner(state, depth=ENDGAME_DEPTH):
+    # The winner under best play, or None when it cannot be proven cheaply.
+    winner = state.getWinner()
+    if winner is not None:
+        return winner
+    p1_walls = state.wallsRemaining(1)
+    p2_walls = state.wallsRemaining(2)
+    if p1_walls and p2_walls:
+        return None
+    if not p1_walls and not p2_walls:
+        return raceWinner(state)
+
+    key = (state.zobrist, depth)
+    if key in _cache:
+        return _cache[key]
+    walled = 1 if p1_walls else 2
+    result = _solve(state, walled, p1_walls or p2_walls, depth)
+    if len(_cache) >= CACHE_LIMIT:
+        _cache.clear()
+    _cache[key] = result
+    return result
+
+
+def _solve(state, walled, walls_left, depth):
+    # Only `walled` has walls. Its race win is final, since the opponent cannot lengthen
+    # its path; anything short of that needs the search.
+    mover = state.player_turn
+    race = state.getShortestPathLength(walled) - state.getShortestPathLength(3 - walled)
+    if race < 0 or (race == 0 and mover == walled):
+        return walled
+    if depth == 0 or walls_left > ENDGAME_WALLS:
+        return None
+    unknown = False
+    for move in state.getLegalMoves():
+        state.push(move)
+        try:
+            result = endgameWinner(state, depth - 1)
+        finally:
+            state.pop()
+        if result == mover:
+            return mover
+        if result is None:
+            unknown = True
+    return None if unknown else 3 - mover
@@ -1,69 +1,283 @@
-import time
+# eval.py - self-play benchmark harness
+#
+# Plays agent-vs-agent matches across a process pool with fixed seeds and reports
+# throughput, move latency and win rate as JSON, e.g.
+#   python eval.py --games 200 --workers 8 --a '{"engine": "mcts", "iterations": 20}' --b '{"engine": "random"}'
+# Compare engines at equal time with e.g.
+#   --a '{"engine": "negamax", "time_limit_ms": 500}' --b '{"engine": "mcts", "time_limit_ms": 500}'
+# With --max-slowdown the exit code gates on engine A's iterations/sec against engine B's;
+# --profile adds the instrumentation counters and phase timers for each engine, and
+# --record appends every game to a records.py game-record file. An MCTS config with
+# "batch": N plays its rollouts N at a time through batchsim.py, and --batch-selfplay EPSILON
+# instead plays --games games of the batched rollout policy against itself in lockstep.
+# MCTS configs also take "uct" (exploration constant), "rave" (RAVE equivalence parameter),
+# "widening" (progressive widening exponent) and "relevant" (expand relevant walls only).
+# --sizes 9,11,13,17 instead reports per-ply playout and move-generation cost on each board size.
+import argparse
+import json
+import math
 import random
-from game_state import QuoridorState
-from mcts import best_ai_move
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import instrumentation
+from game_state import QuoridorState, boardTables, newGame
+from mcts import MCTSSearcher, EXPLORATION_WEIGHT, playout
+from negamax import NegamaxSearcher
+from records import GameWriter, packMoves
+
+DEFAULT_A = {"engine": "mcts", "iterations": 10}
+DEFAULT_B = {"engine": "random"}
+MAX_PLIES = 300  # Games longer than this are scored as draws.
 
 
 def random_agent_move(state):
     moves = state.getLegalMoves()
-    return random.choice(moves)[:2] if moves else None
+    return random.choice(moves) if moves else None
 
 
-def run_single_game():
-    #AI is player 2
-    state = QuoridorState(player1_pos=(8, 4), player2_pos=(0, 4), barriers=[], player_turn=1)
-    ai_turn = True  
-    move_times = []
-    moves_count = 0
-
-    # Track move efficiency
-    while not state.isTerminal():
-        start_time = time.time()
-        if ai_turn:
-            move = best_ai_move(state)
-        else:
+class Agent:
+    def __init__(self, config, player):
+        self.config = config
+        self.searcher = None
+        if config["engine"] == "mcts":
+            self.searcher = MCTSSearcher(ai_player=player, iterations=config.get("iterations", 10),
+                                         time_limit_ms=config.get("time_limit_ms"), batchSize=config.get("batch"),
+                                         batchSimulation="batch" in config,
+                                         explorationWeight=config.get("uct", EXPLORATION_WEIGHT),
+                                         raveEquivalence=config.get("rave"), widening=config.get("widening"),
+                                         relevantWalls=config.get("relevant", False))
+        elif config["engine"] == "negamax":
+            # "depth" caps the iterative deepening; negamax reports nodes searched as iterations.
+            self.searcher = NegamaxSearcher(ai_player=player, iterations=config.get("depth"),
+                                            time_limit_ms=config.get("time_limit_ms"))
+        elif config["engine"] != "random":
+            raise ValueError(f"Unknown engine: {config['engine']}")
+        self.latencies = []
+        self.iterations = 0
+        self.rolloutPlies = 0
+        self.searchTime = 0.0
+        self.stats = instrumentation.SearchStats()
+
+    def move(self, state):
+        start_time = time.perf_counter()
+        if self.searcher is None:
             move = random_agent_move(state)
+        else:
+            move = self.searcher.search(state)
+            self.iterations += self.searcher.lastIterations
+            self.rolloutPlies += self.searcher.lastRolloutPlies
+            if self.searcher.lastStats is not None:
+                self.stats.add(self.searcher.lastStats)
+        elapsed = time.perf_counter() - start_time
+        self.latencies.append(elapsed)
+        self.searchTime += elapsed
+        return move
+
 
-        elapsed = time.time() - start_time
-        if ai_turn:
-            move_times.append(elapsed)
+def run_single_game(config_a, config_b, seed, a_player=1, profile=False):
+    # Engine A plays a_player, engine B the other side. Player 1 moves first.
+    random.seed(seed)
+    instrumentation.enable(profile)
+    state = QuoridorState(player1_pos=(8, 4), player2_pos=(0, 4), barriers=[], player_turn=1)
+    agents = {a_player: Agent(config_a, a_player), 3 - a_player: Agent(config_b, 3 - a_player)}
+    moves = []
 
+    while not state.isTerminal() and len(moves) < MAX_PLIES:
+        move = agents[state.player_turn].move(state)
         if move is None:
             break
-
         state = state.applyMoves(move)
-        ai_turn = not ai_turn
-        moves_count += 1
+        moves.append(move)
 
     winner = state.getWinner()
-    ai_won = winner == 2
-    avg_move_time = sum(move_times) / len(move_times) if move_times else 0
+    result = {"seed": seed, "plies": len(moves), "a_player": a_player, "moves": packMoves(moves),
+              "player_winner": winner, "winner": None if winner is None else ("a" if winner == a_player else "b")}
+    for name, player in (("a", a_player), ("b", 3 - a_player)):
+        agent = agents[player]
+        result[name] = {"latencies": agent.latencies, "iterations": agent.iterations,
+                        "rollout_plies": agent.rolloutPlies, "search_time": agent.searchTime,
+                        "stats": agent.stats.asDict()}
+    return result
+
+
+def percentile(values, q):
+    # Nearest-rank percentile; values need not be sorted.
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def wilson_interval(wins, games, z=1.96):
+    if games == 0:
+        return (0.0, 1.0)
+    p = wins / games
+    denom = 1 + z * z / games
+    centre = (p + z * z / (2 * games)) / denom
+    half = z * math.sqrt(p * (1 - p) / games + z * z / (4 * games * games)) / denom
+    return (max(0.0, centre - half), min(1.0, centre + half))
+
+
+def summarize_agent(config, results, name):
+    latencies = [t for result in results for t in result[name]["latencies"]]
+    iterations = sum(result[name]["iterations"] for result in results)
+    plies = sum(result[name]["rollout_plies"] for result in results)
+    search_time = sum(result[name]["search_time"] for result in results)
+    stats = instrumentation.SearchStats()
+    for result in results:
+        stats.add(result[name]["stats"])
+    return {
+        "config": config,
+        "moves": len(latencies),
+        "iterations": iterations,
+        "iterations_per_sec": iterations / search_time if search_time else 0.0,
+        "rollout_plies_per_sec": plies / search_time if search_time else 0.0,
+        "latency_ms": {"p50": _ms(percentile(latencies, 50)), "p95": _ms(percentile(latencies, 95)),
+                       "p99": _ms(percentile(latencies, 99))},
+        "profile": stats.asDict(),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+def run_benchmark(config_a, config_b, games=100, workers=1, seed=0, profile=False, record=None):
+    # Seats alternate so neither engine always has the first move.
+    jobs = [(config_a, config_b, seed + i, 1 + i % 2, profile) for i in range(games)]
+    start_time = time.perf_counter()
+    if workers <= 1:
+        results = [run_single_game(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run_single_game, *zip(*jobs)))
+    elapsed = time.perf_counter() - start_time
+    if record:
+        with GameWriter(record) as writer:
+            for result in results:
+                writer.write(result["moves"], result["player_winner"])
+
+    a_wins = sum(result["winner"] == "a" for result in results)
+    b_wins = sum(result["winner"] == "b" for result in results)
+    low, high = wilson_interval(a_wins, games)
+    return {
+        "games": games,
+        "workers": workers,
+        "seed": seed,
+        "elapsed_sec": elapsed,
+        "games_per_sec": games / elapsed if elapsed else 0.0,
+        "avg_plies": sum(result["plies"] for result in results) / games if games else 0.0,
+        "a_wins": a_wins,
+        "b_wins": b_wins,
+        "draws": games - a_wins - b_wins,
+        "a_win_rate": a_wins / games if games else 0.0,
+        "a_win_rate_ci95": [low, high],
+        "a": summarize_agent(config_a, results, "a"),
+        "b": summarize_agent(config_b, results, "b"),
+    }
+
+
+def run_batch_selfplay(games=100, seed=0, epsilon=0.1):
+    # Needs NumPy; imported here so the other benchmarks run without it.
+    from batchsim import BatchSimulator
+    start_time = time.perf_counter()
+    winners, plies = BatchSimulator.newGames(games, epsilon, seed).run(MAX_PLIES)
+    elapsed = time.perf_counter() - start_time
+    return {
+        "games": games,
+        "seed": seed,
+        "epsilon": epsilon,
+        "elapsed_sec": elapsed,
+        "games_per_sec": games / elapsed if elapsed else 0.0,
+        "plies_per_sec": sum(plies) / elapsed if elapsed else 0.0,
+        "avg_plies": sum(plies) / games if games else 0.0,
+        "player1_wins": winners.count(1),
+        "player2_wins": winners.count(2),
+        "draws": winners.count(None),
+    }
+
 
-    return ai_won, moves_count, avg_move_time
+def run_size_benchmark(sizes, games=10, seed=0):
+    # Greedy playouts from the start position on each board size. Move generation is timed
+    # separately by replaying the playouts with that size's wall caches cleared.
+    report = {"games": games, "seed": seed, "sizes": {}}
+    for size in sizes:
+        start_time = time.perf_counter()
+        board = boardTables(size)
+        tables_sec = time.perf_counter() - start_time
+        board.distanceCache.clear()
+        board.wallSlotCache.clear()
+        state = newGame(size)
+        games_moves = []
+        start_time = time.perf_counter()
+        for i in range(games):
+            random.seed(seed + i)
+            moves = []
+            playout(state, moves)
+            games_moves.append(moves)
+        playout_sec = time.perf_counter() - start_time
+        plies = sum(len(moves) for moves in games_moves)
 
+        board.distanceCache.clear()
+        board.wallSlotCache.clear()
+        legal_sec = 0.0
+        legal_moves = 0
+        for moves in games_moves:
+            for move in moves:
+                start_time = time.perf_counter()
+                legal_moves += len(state.getLegalMoves())
+                legal_sec += time.perf_counter() - start_time
+                state.push(move)
+            for _ in moves:
+                state.pop()
+        report["sizes"][size] = {
+            "wall_slots": len(board.wallSlots),
+            "tables_ms": _ms(tables_sec),
+            "avg_plies": plies / games if games else 0.0,
+            "playout_us_per_ply": playout_sec / plies * 1e6 if plies else None,
+            "legal_moves_us_per_ply": legal_sec / plies * 1e6 if plies else None,
+            "avg_legal_moves": legal_moves / plies if plies else 0.0,
+        }
+    return report
 
-# TEST
-def evaluate_ai(num_games=1000):
-    ai_wins = 0
-    total_moves = 0
-    total_time = 0
 
-    for i in range(num_games):
-        ai_won, moves, avg_time = run_single_game()
-        ai_wins += ai_won
-        total_moves += moves
-        total_time += avg_time
-        print(f"Game {i+1}: AI {'won' if ai_won else 'lost'} in {moves} moves (avg AI move time: {avg_time:.4f}s)")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quoridor engine benchmark")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--a", type=json.loads, default=DEFAULT_A, help="engine A config as JSON")
+    parser.add_argument("--b", type=json.loads, default=DEFAULT_B, help="engine B config as JSON")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--profile", action="store_true", help="collect search counters and phase timers")
+    parser.add_argument("--record", help="append the games to this game-record file")
+    parser.add_argument("--max-slowdown", type=float,
+                        help="fail if A's iterations/sec is more than this fraction below B's")
+    parser.add_argument("--batch-selfplay", type=float, metavar="EPSILON",
+                        help="play the batched rollout policy against itself instead")
+    parser.add_argument("--sizes", type=lambda text: [int(size) for size in text.split(",")],
+                        help="comma-separated board sizes: report per-ply cost on each instead")
+    args = parser.parse_args(argv)
 
-    win_rate = (ai_wins / num_games) * 100
-    avg_moves = total_moves / num_games
-    avg_move_time = total_time / num_games
+    if args.sizes:
+        report = run_size_benchmark(args.sizes, args.games, args.seed)
+    elif args.batch_selfplay is not None:
+        report = run_batch_selfplay(args.games, args.seed, args.batch_selfplay)
+    else:
+        report = run_benchmark(args.a, args.b, args.games, args.workers, args.seed, args.profile, args.record)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
 
-    print("\nAI Evaluation Results:")
-    print(f"AI Win Rate: {win_rate}%")
-    print(f"Average moves per game: {avg_moves:.2f}")
-    print(f"Average AIgit decision time per move: {avg_move_time:.4f}s")
+    if args.max_slowdown is not None and args.batch_selfplay is None and not args.sizes:
+        baseline = report["b"]["iterations_per_sec"]
+        if report["a"]["iterations_per_sec"] < (1 - args.max_slowdown) * baseline:
+            return 1
+    return 0
 
 
 if __name__ == "__main__":
-    evaluate_ai(num_games=1000)
\ No newline at end of file
+    sys.exit(main())
@@ -1,183 +1,738 @@
 # game_state.py - stores game logic and QuoridorState Class
-import copy
 import heapq
-from constants import GRID_SIZE
+import random
+import threading
+from collections import OrderedDict
+import instrumentation
+from constants import GRID_SIZE, BOARD_SIZES, BARRIERS_PER_PLAYER
+
+ORIENTATIONS = ('horizontal', 'vertical')
+
+# Direction index for a one-step (dr, dc) offset.
+STEP_DIRECTION = {(-1, 0): 0, (1, 0): 1, (0, -1): 2, (0, 1): 3}
+# Offsets for the pawn step codes used by encodeMove.
+STEP_OFFSETS = tuple(offset for offset, _ in sorted(STEP_DIRECTION.items(), key=lambda item: item[1]))
+
+def cellIndex(pos, size=GRID_SIZE):
+    return pos[0] * size + pos[1]
+
+def wallBit(row, col, orientation, size=GRID_SIZE):
+    # Horizontal walls occupy bits [0, size * size), vertical walls the next size * size bits,
+    # both indexed by the wall's (row, col) anchor.
+    offset = 0 if orientation == 'horizontal' else size * size
+    return 1 << (offset + row * size + col)
+
+def _blockerMask(row, col, direction, size):
+    # Walls that sit on the edge leaving (row, col) in the given direction.
+    # A horizontal wall (r, c) lies along the top edge of cells (r, c) and (r, c+1);
+    # a vertical wall (r, c) lies along the left edge of cells (r, c) and (r+1, c).
+    if direction in (0, 1):
+        edge_row = row if direction == 0 else row + 1
+        anchors = [(edge_row, col), (edge_row, col - 1)]
+        orientation = 'horizontal'
+    else:
+        edge_col = col if direction == 2 else col + 1
+        anchors = [(row, edge_col), (row - 1, edge_col)]
+        orientation = 'vertical'
+    mask = 0
+    for r, c in anchors:
+        if 0 <= r < size and 0 <= c < size:
+            mask |= wallBit(r, c, orientation, size)
+    return mask
+
+def _wallConflicts(row, col, orientation, size):
+    # Walls that cannot coexist with (row, col, orientation): the same slot, the two
+    # overlapping slots of the same orientation and the one slot crossing it at its midpoint.
+    if orientation == 'horizontal':
+        others = [(row, col, 'horizontal'), (row, col - 1, 'horizontal'),
+                  (row, col + 1, 'horizontal'), (row - 1, col + 1, 'vertical')]
+    else:
+        others = [(row, col, 'vertical'), (row - 1, col, 'vertical'),
+                  (row + 1, col, 'vertical'), (row + 1, col - 1, 'horizontal')]
+    mask = 0
+    for r, c, o in others:
+        if 0 <= r < size and 0 <= c < size:
+            mask |= wallBit(r, c, o, size)
+    return mask
+
+def _wallPoints(row, col, orientation):
+    # Grid points covered by a wall: a horizontal wall runs along row line `row` from
+    # column line col to col + 2, a vertical one along column line `col`.
+    if orientation == 'horizontal':
+        return [(row, col + i) for i in range(3)]
+    return [(row + i, col) for i in range(3)]
+
+class WallCache:
+    # Process-wide LRU cache for results that depend on the wall layout, shared by every
+    # state and search in the process; thousands of positions in one search differ only in
+    # pawn squares. Thread-safe, since the UI thread and a background search share it.
+    def __init__(self, maxEntries):
+        self.maxEntries = maxEntries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxEntries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+class BoardTables:
+    # Everything that depends only on the board size, built once per size by boardTables()
+    # and shared by every state of that size. Move generation and pathfinding read these
+    # tables instead of doing edge arithmetic, so a bigger board only means longer tables.
+    def __init__(self, size):
+        self.size = size
+        self.cellCount = cellCount = size * size
+        # (row, col) for every cell index, so positions can be stored as plain ints.
+        self.cellPos = tuple((idx // size, idx % size) for idx in range(cellCount))
+        # edgeBlockers[cell][direction] -> mask of wall bits that block that step.
+        self.edgeBlockers = tuple(tuple(_blockerMask(r, c, d, size) for d in range(4)) for r, c in self.cellPos)
+        # neighbors[cell] -> ((neighbor cell, blocker mask), ...) for the on-board steps.
+        self.neighbors = tuple(
+            tuple(((r + dr) * size + c + dc, self.edgeBlockers[r * size + c][d])
+                  for (dr, dc), d in STEP_DIRECTION.items()
+                  if 0 <= r + dr < size and 0 <= c + dc < size)
+            for r, c in self.cellPos)
+
+        # Every wall slot that separates two rows or two columns of the board, as
+        # (row, col, orientation, bit, conflict mask). Horizontal walls sit on the top edge
+        # of row 1..size-1, vertical walls on the left edge of column 1..size-1.
+        self.wallSlots = tuple(
+            (r, c, o, wallBit(r, c, o, size), _wallConflicts(r, c, o, size))
+            for o in ORIENTATIONS
+            for r, c in (((r, c) for r in range(1, size) for c in range(size - 1)) if o == 'horizontal'
+                         else ((r, c) for r in range(size - 1) for c in range(1, size))))
+        self.wallSlotIndex = {slot[:3]: i for i, slot in enumerate(self.wallSlots)}
+        # wallNeighbors[bit index] -> mask of the wall slots sharing a grid point with that wall,
+        # gathered through a grid point -> covering walls map in one pass over the slots.
+        pointWalls = {}
+        for r, c, o, bit, _ in self.wallSlots:
+            for point in _wallPoints(r, c, o):
+                pointWalls[point] = pointWalls.get(point, 0) | bit
+        wallNeighbors = [0] * (2 * cellCount)
+        for r, c, o, bit, _ in self.wallSlots:
+            for point in _wallPoints(r, c, o):
+                wallNeighbors[bit.bit_length() - 1] |= pointWalls[point]
+        self.wallNeighbors = tuple(wallNeighbors)
+        # slotPoints[slot] -> the grid points that wall covers.
+        self.slotPoints = tuple(tuple(_wallPoints(r, c, o)) for r, c, o, _, _ in self.wallSlots)
+        # cellWalls[cell] -> mask of every wall bit on one of the cell's four edges.
+        self.cellWalls = tuple(blockers[0] | blockers[1] | blockers[2] | blockers[3] for blockers in self.edgeBlockers)
+
+        # Shared move tuples, so move lists hold references instead of fresh tuples per call.
+        self.wallMoves = tuple(("barrier", (r, c), o) for r, c, o, _, _ in self.wallSlots)
+        self.pawnMoves = tuple(
+            tuple((new_cell, blockers, ("move", self.cellPos[cell], self.cellPos[new_cell]))
+                  for new_cell, blockers in self.neighbors[cell])
+            for cell in range(cellCount))
+        self.moveCodes = 4 + len(self.wallSlots)
+        # Player 1 starts in the middle of the bottom row, player 2 in the middle of the top row.
+        self.startPositions = ((size - 1, size // 2), (0, size // 2))
+
+        # Zobrist keys: one random 64-bit word per pawn square, wall bit, barrier count and side
+        # to move. Seeded so keys are stable across processes and runs; the standard board keeps
+        # its original seed so stored keys (the opening book) stay valid.
+        rng = random.Random(0x51D0 if size == GRID_SIZE else 0x51D0 ^ (size << 16))
+        self.zobristPawn = tuple(tuple(rng.getrandbits(64) for _ in range(cellCount)) for _ in range(3))
+        self.zobristWall = tuple(rng.getrandbits(64) for _ in range(2 * cellCount))
+        self.zobristBarriers = tuple(tuple(rng.getrandbits(64) for _ in range(BARRIERS_PER_PLAYER + 1))
+                                     for _ in range(3))
+        self.zobristTurn = rng.getrandbits(64)
+
+        # Wall mask -> (player 1 map, player 2 map) from distanceMap().
+        self.distanceCache = WallCache(1 << 14)
+        # Wall mask -> wallLayout() result, from which legalWallSlots() answers for any pawn squares.
+        self.wallSlotCache = WallCache(1 << 14)
+
+    def __reduce__(self):
+        # States sent to worker processes carry only the size; each process uses its own tables.
+        return boardTables, (self.size,)
+
+_boards = {}
+
+def boardTables(size=GRID_SIZE):
+    board = _boards.get(size)
+    if board is None:
+        if size < 2:
+            raise ValueError(f"Board size must be at least 2, got {size}")
+        # Two threads may race to build the same size; setdefault keeps one copy.
+        board = _boards.setdefault(size, BoardTables(size))
+    return board
+
+# The standard board's tables under module-level names, for batchsim.py and records.py,
+# which only handle GRID_SIZE boards.
+DEFAULT_BOARD = boardTables(GRID_SIZE)
+CELL_COUNT = DEFAULT_BOARD.cellCount
+CELL_POS = DEFAULT_BOARD.cellPos
+EDGE_BLOCKERS = DEFAULT_BOARD.edgeBlockers
+WALL_SLOTS = DEFAULT_BOARD.wallSlots
+WALL_MOVES = DEFAULT_BOARD.wallMoves
+MOVE_CODES = DEFAULT_BOARD.moveCodes
+
+def cacheStats(size=GRID_SIZE):
+    board = boardTables(size)
+    return {"distance_maps": board.distanceCache.stats(), "wall_slots": board.wallSlotCache.stats()}
+
+def pathExists(walls, start_cell, goal_row, board=DEFAULT_BOARD):
+    # Early-exit depth-first search; cheaper than a full distance map for a yes/no answer.
+    if instrumentation.enabled:
+        instrumentation.stats.path_checks += 1
+    size = board.size
+    neighbors = board.neighbors
+    goal_start = goal_row * size
+    seen = {start_cell}
+    stack = [start_cell]
+    while stack:
+        cell = stack.pop()
+        if goal_start <= cell < goal_start + size:
+            return True
+        for new_cell, blockers in neighbors[cell]:
+            if new_cell not in seen and not walls & blockers:
+                seen.add(new_cell)
+                stack.append(new_cell)
+    return False
+
+def reachableCells(walls, start_cells, board=DEFAULT_BOARD):
+    # Mask of the cells that have a path to any of start_cells.
+    if instrumentation.enabled:
+        instrumentation.stats.path_checks += 1
+    neighbors = board.neighbors
+    stack = list(start_cells)
+    reached = 0
+    for cell in stack:
+        reached |= 1 << cell
+    while stack:
+        cell = stack.pop()
+        for new_cell, blockers in neighbors[cell]:
+            if not reached >> new_cell & 1 and not walls & blockers:
+                reached |= 1 << new_cell
+                stack.append(new_cell)
+    return reached
+
+def wallLayout(walls, board=DEFAULT_BOARD):
+    # Wall legality that depends on the walls alone: (free, cuts), where free holds every slot
+    # the walls leave open and cuts holds (slot, cut1, cut2) for the open slots that would cut
+    # cells off from a goal row, cut1/cut2 masking the cells cut off from row 0 / the last row.
+    # A new wall can only close off a region if it joins two grid points of the same barrier,
+    # a chain of walls or the border, so only those slots are searched. selfcheck.py compares
+    # the result against direct path searches.
+    size = board.size
+    cell_count = board.cellCount
+    all_cells = (1 << cell_count) - 1
+    # Union-find over grid points, with every border point under the 'border' root.
+    parent = {}
+
+    def find(point):
+        if point[0] in (0, size) or point[1] in (0, size):
+            return 'border'
+        root = point
+        while parent.get(root, root) != root:
+            root = parent[root]
+        return root
+
+    remaining = walls
+    while remaining:
+        low = remaining & -remaining
+        index = low.bit_length() - 1
+        orientation = 'horizontal' if index < cell_count else 'vertical'
+        roots = {find(point) for point in _wallPoints(*board.cellPos[index % cell_count], orientation)}
+        top = 'border' if 'border' in roots else roots.pop()
+        for root in roots:
+            if root != top:
+                parent[root] = top
+        remaining ^= low
+    free = []
+    cuts = []
+    for slot, (_, _, _, bit, conflicts) in enumerate(board.wallSlots):
+        if walls & conflicts:
+            continue
+        free.append(slot)
+        roots = [find(point) for point in board.slotPoints[slot]]
+        if len(set(roots)) == len(roots):
+            continue
+        # A board that stays connected cuts no cell off from either goal row.
+        if reachableCells(walls | bit, (0,), board) == all_cells:
+            continue
+        cut1 = all_cells & ~reachableCells(walls | bit, range(size), board)
+        cut2 = all_cells & ~reachableCells(walls | bit, range(cell_count - size, cell_count), board)
+        cuts.append((slot, cut1, cut2))
+    return tuple(free), tuple(cuts)
 
 def a_star(start, goal_row, state):
+    if instrumentation.enabled:
+        instrumentation.stats.a_star += 1
+    walls = state.walls
+    board = state.board
+    start = cellIndex(start, board.size)
     priority_queue = []
-    heapq.heappush(priority_queue, (0, start))  # (priority, position)
+    heapq.heappush(priority_queue, (0, start))  # (priority, cell)
     cost_so_far = {start: 0}
 
     while priority_queue:
-        _, (row, col) = heapq.heappop(priority_queue)
-
-        if row == goal_row:
-            return cost_so_far[(row, col)]  # Return path length
+        _, cell = heapq.heappop(priority_queue)
 
-        for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            new_pos = (row + dr, col + dc)
+        if board.cellPos[cell][0] == goal_row:
+            return cost_so_far[cell]  # Return path length
 
-            if 0 <= new_pos[0] < GRID_SIZE and 0 <= new_pos[1] < GRID_SIZE:
-                if not state.isMoveBlocked((row, col), new_pos):
-                    new_cost = cost_so_far[(row, col)] + 1  # Uniform cost
-                    if new_pos not in cost_so_far or new_cost < cost_so_far[new_pos]:
-                        cost_so_far[new_pos] = new_cost
-                        priority = new_cost + abs(goal_row - new_pos[0])  # Manhattan heuristic
-                        heapq.heappush(priority_queue, (priority, new_pos))
+        for new_cell, blockers in board.neighbors[cell]:
+            if not walls & blockers:
+                new_cost = cost_so_far[cell] + 1  # Uniform cost
+                if new_cell not in cost_so_far or new_cost < cost_so_far[new_cell]:
+                    cost_so_far[new_cell] = new_cost
+                    priority = new_cost + abs(goal_row - board.cellPos[new_cell][0])  # Manhattan heuristic
+                    heapq.heappush(priority_queue, (priority, new_cell))
 
     return float('inf')  # No valid path
 
+def distanceMap(walls, goal_row, board=DEFAULT_BOARD):
+    # Breadth-first search outward from the whole goal row; entry i is the number of
+    # steps from cell i to the goal row (inf if the goal cannot be reached).
+    if instrumentation.enabled:
+        instrumentation.stats.distance_maps += 1
+    size = board.size
+    neighbors = board.neighbors
+    distances = [float('inf')] * board.cellCount
+    frontier = list(range(goal_row * size, (goal_row + 1) * size))
+    for cell in frontier:
+        distances[cell] = 0
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for cell in frontier:
+            for new_cell, blockers in neighbors[cell]:
+                if distances[new_cell] > depth and not walls & blockers:
+                    distances[new_cell] = depth
+                    next_frontier.append(new_cell)
+        frontier = next_frontier
+    return tuple(distances)
+
 class QuoridorState:
-    def __init__(self, player1_pos, player2_pos, barriers, player_turn, lastMoveTaken=None):
-        self.player1_pos = player1_pos
-        self.player2_pos = player2_pos
-        self.barriers = barriers
+    def __init__(self, player1_pos, player2_pos, barriers, player_turn, lastMoveTaken=None, size=GRID_SIZE):
+        # Size-dependent tables, shared with every other state of the same size.
+        self.board = boardTables(size)
+        self.player1_cell = cellIndex(player1_pos, size)
+        self.player2_cell = cellIndex(player2_pos, size)
+        self.walls = 0
+        for wall in barriers:
+            self.walls |= wallBit(*wall, size)
         self.player_turn = player_turn
         self.lastMoveTaken = lastMoveTaken
-        self.player1_barriers = 10
-        self.player2_barriers = 10
+        self.player1_barriers = BARRIERS_PER_PLAYER
+        self.player2_barriers = BARRIERS_PER_PLAYER
+        # Maintained incrementally by push/pop and the pawn position setters below.
+        self.zobrist = self.computeZobrist()
+        # Goal-distance maps for both players, valid for the wall mask they were built from.
+        # Pawn moves leave the walls alone, so children share the parent's maps.
+        self._distances = None
+        self._distanceWalls = None
+        # Undo records for push/pop.
+        self._moveStack = []
+
+    @property
+    def size(self):
+        return self.board.size
+
+    @property
+    def player1_pos(self):
+        return self.board.cellPos[self.player1_cell]
+
+    @player1_pos.setter
+    def player1_pos(self, pos):
+        cell = cellIndex(pos, self.board.size)
+        self.zobrist ^= self.board.zobristPawn[1][self.player1_cell] ^ self.board.zobristPawn[1][cell]
+        self.player1_cell = cell
+
+    @property
+    def player2_pos(self):
+        return self.board.cellPos[self.player2_cell]
+
+    @player2_pos.setter
+    def player2_pos(self, pos):
+        cell = cellIndex(pos, self.board.size)
+        self.zobrist ^= self.board.zobristPawn[2][self.player2_cell] ^ self.board.zobristPawn[2][cell]
+        self.player2_cell = cell
+
+    @property
+    def barriers(self):
+        # Read-only (row, col, orientation) view of the wall bitmask, for the UI.
+        board = self.board
+        walls = []
+        for offset, orientation in ((0, 'horizontal'), (board.cellCount, 'vertical')):
+            for idx in range(board.cellCount):
+                if self.walls >> (offset + idx) & 1:
+                    walls.append((*board.cellPos[idx], orientation))
+        return walls
+
+    @barriers.setter
+    def barriers(self, barriers):
+        self.walls = 0
+        for wall in barriers:
+            self.walls |= wallBit(*wall, self.board.size)
+        self.zobrist = self.computeZobrist()
+
+    def computeZobrist(self):
+        # Full recomputation; only needed after editing fields directly.
+        board = self.board
+        key = board.zobristPawn[1][self.player1_cell] ^ board.zobristPawn[2][self.player2_cell]
+        key ^= board.zobristBarriers[1][self.player1_barriers] ^ board.zobristBarriers[2][self.player2_barriers]
+        if self.player_turn == 2:
+            key ^= board.zobristTurn
+        walls = self.walls
+        while walls:
+            low = walls & -walls
+            key ^= board.zobristWall[low.bit_length() - 1]
+            walls ^= low
+        return key
+
+    def _key(self):
+        return (self.board.size, self.player1_cell, self.player2_cell, self.walls,
+                self.player1_barriers, self.player2_barriers, self.player_turn)
 
     def __eq__(self, other):
         if not isinstance(other, QuoridorState):
             return False
-        return (self.player1_pos == other.player1_pos and
-                self.player2_pos == other.player2_pos and
-                set(self.barriers) == set(other.barriers) and
-                self.player1_barriers == other.player1_barriers and
-                self.player2_barriers == other.player2_barriers and
-                self.player_turn == other.player_turn)
+        return self._key() == other._key()
 
     def __hash__(self):
         #good for set/dict use
-        return hash((self.player1_pos, self.player2_pos, frozenset(self.barriers),
-                     self.player1_barriers, self.player2_barriers, self.player_turn))
+        return self.zobrist
 
     def isMoveBlocked(self, start_pos, end_pos):
-        r, c = start_pos
-        r2, c2 = end_pos
-
-        # Moving up: crossing from row r to r-1.
-        if r2 == r - 1 and c2 == c:
-            # For a horizontal wall stored as (r, col, 'horizontal'),
-            # the wall sits along the edge between row r and r-1.
-            return any(len(w) == 3 and w[2] == 'horizontal' and w[0] == r and (c == w[1] or c == w[1] + 1) for w in self.barriers)
-
-        # Moving down: crossing from row r to r+1.
-        elif r2 == r + 1 and c2 == c:
-            return any(len(w) == 3 and w[2] == 'horizontal' and w[0] == r2 and (c == w[1] or c == w[1] + 1) for w in self.barriers)
-
-        # Moving right: crossing from column c to c+1.
-        elif r2 == r and c2 == c + 1:
-            return any(len(w) == 3 and w[2] == 'vertical' and w[1] == c2 and (r == w[0] or r == w[0] + 1) for w in self.barriers)
-
-        # Moving left: crossing from column c to c-1.
-        elif r2 == r and c2 == c - 1:
-            return any(len(w) == 3 and w[2] == 'vertical' and w[1] == c and (r == w[0] or r == w[0] + 1) for w in self.barriers)
+        direction = STEP_DIRECTION.get((end_pos[0] - start_pos[0], end_pos[1] - start_pos[1]))
+        if direction is None:
+            return False
+        return bool(self.walls & self.board.edgeBlockers[cellIndex(start_pos, self.board.size)][direction])
 
-        return False
+    def distanceMaps(self):
+        if self._distanceWalls != self.walls:
+            board = self.board
+            maps = board.distanceCache.get(self.walls)
+            if maps is None:
+                maps = (distanceMap(self.walls, 0, board), distanceMap(self.walls, board.size - 1, board))
+                board.distanceCache.put(self.walls, maps)
+            self._distances = maps
+            self._distanceWalls = self.walls
+        return self._distances
 
     def getShortestPathLength(self, player):
-        return a_star(self.player1_pos, 0, self) if player == 1 else a_star(self.player2_pos, GRID_SIZE - 1, self)
+        p1_map, p2_map = self.distanceMaps()
+        return p1_map[self.player1_cell] if player == 1 else p2_map[self.player2_cell]
 
     def wallsRemaining(self, player):
         return self.player1_barriers if player == 1 else self.player2_barriers
 
-    def getLegalMoves(self):
-        #print(f"Checking legal moves. Current barriers: {self.barriers}")
+    def getLegalMoves(self, relevantOnly=False):
+        # relevantOnly limits walls to those from relevantWallMask().
+        if instrumentation.enabled:
+            instrumentation.stats.legal_moves += 1
         legal_moves = []
-        row, col = self.player1_pos if self.player_turn == 1 else self.player2_pos
-        for move_dir, (dr, dc) in [('up', (-1, 0)), ('down', (1, 0)),
-                               ('left', (0, -1)), ('right', (0, 1))]:
-            new_row, new_col = row + dr, col + dc
-            if 0 <= new_row < GRID_SIZE and 0 <= new_col < GRID_SIZE:
-                if not self.isMoveBlocked((row, col), (new_row, new_col)):
-                    legal_moves.append(("move", (row, col), (new_row, new_col))) 
+        cell = self.player1_cell if self.player_turn == 1 else self.player2_cell
+        for new_cell, blockers, move in self.board.pawnMoves[cell]:
+            if not self.walls & blockers:
+                legal_moves.append(move)
 
         # Add barrier placements if barriers are remaining
         if self.wallsRemaining(self.player_turn) > 0:
-            for r in range(GRID_SIZE - 1):  # Barriers are placed between cells, so limit by GRID_SIZE-1
-                for c in range(GRID_SIZE - 1):
-                    for orientation in ['horizontal', 'vertical']:
-                        if self.isBarrierPlacementValid((r, c), orientation):
-                            # Temporarily add the barrier to test if paths remain unblocked
-                            temp_barriers = self.barriers + [((r, c), orientation)]
-                            temp_state = copy.deepcopy(self)
-                            temp_state.barriers = temp_barriers
-                            if not temp_state.is_path_blocked():
-                                legal_moves.append(("barrier", (r, c), orientation))
+            wall_moves = self.board.wallMoves
+            for slot in self.legalWallSlots(self.relevantWallMask() if relevantOnly else None):
+                legal_moves.append(wall_moves[slot])
         return legal_moves
 
-    def isBarrierPlacementValid(self, pos, orientation):
-        for barrier in self.barriers:
-            if barrier == (pos[0], pos[1], orientation):
-                return False
-        temp_state = copy.deepcopy(self)
-        temp_state.barriers = self.barriers + [(pos[0], pos[1], orientation)]
+    def _pathBlockers(self, distances, cell):
+        # Follow one shortest path to the goal and collect every wall bit that would cut it.
+        walls = self.walls
+        neighbors = self.board.neighbors
+        cell_count = self.board.cellCount
+        mask = 0
+        while 0 < distances[cell] < cell_count:
+            for new_cell, blockers in neighbors[cell]:
+                if distances[new_cell] == distances[cell] - 1 and not walls & blockers:
+                    mask |= blockers
+                    cell = new_cell
+                    break
+        return mask
+
+    def _pathArea(self, distances, cell):
+        # Every wall bit on an edge of a cell along the same shortest path _pathBlockers follows.
+        walls = self.walls
+        neighbors = self.board.neighbors
+        cell_walls = self.board.cellWalls
+        cell_count = self.board.cellCount
+        mask = cell_walls[cell]
+        while 0 < distances[cell] < cell_count:
+            for new_cell, blockers in neighbors[cell]:
+                if distances[new_cell] == distances[cell] - 1 and not walls & blockers:
+                    cell = new_cell
+                    mask |= cell_walls[cell]
+                    break
+        return mask
+
+    def relevantWallMask(self):
+        # Wall bits next to either player's shortest path or touching a wall already placed.
+        p1_map, p2_map = self.distanceMaps()
+        mask = self._pathArea(p1_map, self.player1_cell) | self._pathArea(p2_map, self.player2_cell)
+        wall_neighbors = self.board.wallNeighbors
+        walls = self.walls
+        while walls:
+            low = walls & -walls
+            mask |= wall_neighbors[low.bit_length() - 1]
+            walls ^= low
+        return mask
 
-        if temp_state.is_path_blocked():
+    def shortestPathBlockers(self, player):
+        # Wall bits that would cut the player's current shortest path.
+        p1_map, p2_map = self.distanceMaps()
+        if player == 1:
+            return self._pathBlockers(p1_map, self.player1_cell)
+        return self._pathBlockers(p2_map, self.player2_cell)
+
+    def _wallDisconnects(self, bit, p1_blockers, p2_blockers):
+        walls = self.walls | bit
+        board = self.board
+        return ((bit & p1_blockers and not pathExists(walls, self.player1_cell, 0, board)) or
+                (bit & p2_blockers and not pathExists(walls, self.player2_cell, board.size - 1, board)))
+
+    def legalWallSlots(self, within=None):
+        # The wall layout is cached per wall mask in the board's wallSlotCache, so positions
+        # differing only in pawn squares share it; a slot is then legal unless it would cut off
+        # one of the pawns, a bit test of the pawn's cell.
+        # within: optional mask of wall bits; other slots are left out.
+        board = self.board
+        layout = board.wallSlotCache.get(self.walls)
+        if layout is None:
+            layout = wallLayout(self.walls, board)
+            board.wallSlotCache.put(self.walls, layout)
+        free, cuts = layout
+        p1 = 1 << self.player1_cell
+        p2 = 1 << self.player2_cell
+        blocked = {slot for slot, cut1, cut2 in cuts if cut1 & p1 or cut2 & p2}
+        if within is None:
+            # Usually nothing is blocked and the cached tuple is returned as is.
+            return tuple(slot for slot in free if slot not in blocked) if blocked else free
+        wall_slots = board.wallSlots
+        return tuple(slot for slot in free if wall_slots[slot][3] & within and slot not in blocked)
+
+    def isBarrierPlacementValid(self, pos, orientation):
+        slot = self.board.wallSlotIndex.get((pos[0], pos[1], orientation))
+        if slot is None:
             return False
-        
-        return True
+        _, _, _, bit, conflicts = self.board.wallSlots[slot]
+        if self.walls & conflicts:
+            return False
+        # Without cached maps, treat every wall as cutting both paths.
+        return not self._wallDisconnects(bit, bit, bit)
 
     def is_path_blocked(self):
-        #print(f"Checking path blockage with barriers: {self.barriers}")
-        return a_star(self.player1_pos, 0, self) == float('inf') or a_star(self.player2_pos, GRID_SIZE - 1, self) == float('inf')
+        if self._distanceWalls != self.walls:
+            maps = self.board.distanceCache.get(self.walls)
+            if maps is None:
+                # One-off connectivity checks are cheaper with an early-exit search than a full map.
+                return a_star(self.player1_pos, 0, self) == float('inf') or a_star(self.player2_pos, self.board.size - 1, self) == float('inf')
+            self._distances = maps
+            self._distanceWalls = self.walls
+        return self.getShortestPathLength(1) == float('inf') or self.getShortestPathLength(2) == float('inf')
     
     def move_player(self, direction):
         row, col = self.player1_pos if self.player_turn == 1 else self.player2_pos
         new_row, new_col = row, col
+        size = self.board.size
 
         if direction == 'up' and row > 0:
             new_row -= 1
-        elif direction == 'down' and row < GRID_SIZE - 1:
+        elif direction == 'down' and row < size - 1:
             new_row += 1
         elif direction == 'left' and col > 0:
             new_col -= 1
-        elif direction == 'right' and col < GRID_SIZE - 1:
+        elif direction == 'right' and col < size - 1:
             new_col += 1
 
         if self.isMoveBlocked((row, col), (new_row, new_col)):
-            print(f"Move blocked! Player {self.player_turn} cannot move {direction}")
-            return
+            return False
 
-        if self.player_turn == 1:
-            self.player1_pos = (new_row, new_col)
-        else:
-            self.player2_pos = (new_row, new_col)
+        # push() switches turns after a valid move.
+        self.push(("move", (row, col), (new_row, new_col)))
+        return True
 
-        print(f"Player {self.player_turn} moved {direction} to ({new_row}, {new_col})")
-        print(f"Current Barriers: {self.barriers}")
-        # Switch turns after a valid move.
-        self.player_turn = 3 - self.player_turn
+    def clone(self):
+        # Every field is an int, tuple or shared immutable map, so a shallow copy is exact.
+        if instrumentation.enabled:
+            instrumentation.stats.clones += 1
+        new_state = QuoridorState.__new__(QuoridorState)
+        new_state.__dict__.update(self.__dict__)
+        new_state._moveStack = []
+        return new_state
 
-    def applyMoves(self, move):
-        new_state = copy.deepcopy(self)
+    def push(self, move):
+        # Apply a move in place; pop() restores the previous position exactly.
+        self._moveStack.append((self.player1_cell, self.player2_cell, self.walls,
+                                self.player1_barriers, self.player2_barriers, self.player_turn,
+                                self.lastMoveTaken, self._distances, self._distanceWalls, self.zobrist))
+        player = self.player_turn
+        board = self.board
+        key = self.zobrist ^ board.zobristTurn
         if move[0] == "move":
             _, from_pos, to_pos = move
-            if self.player_turn == 1:
-                new_state.player1_pos = to_pos
+            cell = to_pos[0] * board.size + to_pos[1]
+            if player == 1:
+                key ^= board.zobristPawn[1][self.player1_cell] ^ board.zobristPawn[1][cell]
+                self.player1_cell = cell
             else:
-                new_state.player2_pos = to_pos
+                key ^= board.zobristPawn[2][self.player2_cell] ^ board.zobristPawn[2][cell]
+                self.player2_cell = cell
         elif move[0] == "barrier":
             _, (row, col), orientation = move
-            new_state.barriers.append((row, col, orientation))
+            bit = wallBit(row, col, orientation, board.size)
+            self.walls |= bit
+            key ^= board.zobristWall[bit.bit_length() - 1]
             # Decrement barrier count
-            if self.player_turn == 1:
-                new_state.player1_barriers -= 1
+            barriers = board.zobristBarriers[player]
+            if player == 1:
+                key ^= barriers[self.player1_barriers] ^ barriers[self.player1_barriers - 1]
+                self.player1_barriers -= 1
             else:
-                new_state.player2_barriers -= 1
+                key ^= barriers[self.player2_barriers] ^ barriers[self.player2_barriers - 1]
+                self.player2_barriers -= 1
         # Switch turns
-        new_state.player_turn = 3 - self.player_turn
+        self.player_turn = 3 - player
+        self.zobrist = key
         # Store last move
-        new_state.lastMoveTaken = move
+        self.lastMoveTaken = move
+
+    def pop(self):
+        move = self.lastMoveTaken
+        (self.player1_cell, self.player2_cell, self.walls,
+         self.player1_barriers, self.player2_barriers, self.player_turn,
+         self.lastMoveTaken, self._distances, self._distanceWalls, self.zobrist) = self._moveStack.pop()
+        return move
+
+    def applyMoves(self, move):
+        new_state = self.clone()
+        new_state.push(move)
         return new_state
 
+    def toNotation(self):
+        # Compact text form: "p1row.p1col/p2row.p2col/turn/p1walls/p2walls/walls", where walls is
+        # a comma-separated list of hROW.COL / vROW.COL (or "-"), e.g. "8.4/0.4/1/10/9/h3.3".
+        # Boards other than GRID_SIZE add the size as a last field, e.g. "10.5/0.5/1/10/10/-/11".
+        walls = ','.join(f"{orientation[0]}{row}.{col}" for row, col, orientation in self.barriers) or '-'
+        (r1, c1), (r2, c2) = self.player1_pos, self.player2_pos
+        text = f"{r1}.{c1}/{r2}.{c2}/{self.player_turn}/{self.player1_barriers}/{self.player2_barriers}/{walls}"
+        return text if self.board.size == GRID_SIZE else f"{text}/{self.board.size}"
+
     def isTerminal(self):
-        return self.player1_pos[0] == 0 or self.player2_pos[0] == GRID_SIZE - 1
+        size = self.board.size
+        return self.player1_cell < size or self.player2_cell >= self.board.cellCount - size
 
     def getWinner(self):
-        if self.player1_pos[0] == 0:
+        size = self.board.size
+        if self.player1_cell < size:
             return 1
-        elif self.player2_pos[0] == GRID_SIZE - 1:
+        elif self.player2_cell >= self.board.cellCount - size:
             return 2
-        return None
\ No newline at end of file
+        return None
+
+def newGame(size=GRID_SIZE):
+    # The start position on a size x size board, player 1 to move.
+    player1_pos, player2_pos = boardTables(size).startPositions
+    return QuoridorState(player1_pos, player2_pos, [], 1, size=size)
+
+def _parseSquare(text, size=GRID_SIZE):
+    row, col = (int(part) for part in text.split('.'))
+    if not (0 <= row < size and 0 <= col < size):
+        raise ValueError(f"Square off the board: {text}")
+    return row, col
+
+def stateFromNotation(text):
+    # Inverse of QuoridorState.toNotation(); raises ValueError on malformed input, including
+    # walls that could not have been placed: off the wall grid, overlapping or crossing
+    # another wall, more walls than the players were dealt, or a pawn cut off from its goal.
+    try:
+        fields = text.strip().split('/')
+        size = int(fields.pop()) if len(fields) == 7 else GRID_SIZE
+        # Notation can come from clients (server.py), and each new size builds and keeps its own
+        # tables, so only the supported variants are accepted.
+        if size not in BOARD_SIZES:
+            raise ValueError(f"unsupported board size {size}, expected one of {BOARD_SIZES}")
+        p1, p2, turn, b1, b2, walls = fields
+        state = QuoridorState(_parseSquare(p1, size), _parseSquare(p2, size), [], int(turn), size=size)
+        state.player1_barriers, state.player2_barriers = int(b1), int(b2)
+        board = state.board
+        placed = 0
+        for wall in walls.split(',') if walls != '-' else ():
+            slot = board.wallSlotIndex.get((*_parseSquare(wall[1:], size), ORIENTATIONS['hv'.index(wall[0])]))
+            if slot is None:
+                raise ValueError(f"no wall slot at {wall}")
+            _, _, _, bit, conflicts = board.wallSlots[slot]
+            if state.walls & conflicts:
+                raise ValueError(f"{wall} overlaps or crosses another wall")
+            state.walls |= bit
+            placed += 1
+    except (ValueError, IndexError) as error:
+        raise ValueError(f"Bad position notation {text!r}: {error}") from None
+    if state.player_turn not in (1, 2) or not (0 <= state.player1_barriers <= BARRIERS_PER_PLAYER and
+                                               0 <= state.player2_barriers <= BARRIERS_PER_PLAYER):
+        raise ValueError(f"Bad position notation {text!r}")
+    if placed + state.player1_barriers + state.player2_barriers > 2 * BARRIERS_PER_PLAYER:
+        raise ValueError(f"Bad position notation {text!r}: more walls than the players hold")
+    if state.is_path_blocked():
+        raise ValueError(f"Bad position notation {text!r}: a pawn has no path to its goal")
+    state.zobrist = state.computeZobrist()
+    return state
+
+def encodeMove(move, board=DEFAULT_BOARD):
+    # Small integer code for a move: 0-3 pawn step up/down/left/right, 4 + slot for a wall.
+    if move[0] == "move":
+        (r, c), (r2, c2) = move[1], move[2]
+        return STEP_DIRECTION[(r2 - r, c2 - c)]
+    return 4 + board.wallSlotIndex[(move[1][0], move[1][1], move[2])]
+
+def decodeMove(code, state):
+    # Inverse of encodeMove for the side to move in state.
+    if code < 4:
+        row, col = state.player1_pos if state.player_turn == 1 else state.player2_pos
+        dr, dc = STEP_OFFSETS[code]
+        return ("move", (row, col), (row + dr, col + dc))
+    return state.board.wallMoves[code - 4]
+
+def moveToNotation(move):
+    # "m7.4" moves the pawn to square 7.4; "h3.3" / "v4.5" place a wall.
+    if move[0] == "move":
+        return f"m{move[2][0]}.{move[2][1]}"
+    _, (row, col), orientation = move
+    return f"{orientation[0]}{row}.{col}"
+
+def moveFromNotation(text, state):
+    kind, square = text[:1], _parseSquare(text[1:], state.board.size)
+    if kind == 'm':
+        from_pos = state.player1_pos if state.player_turn == 1 else state.player2_pos
+        return ("move", from_pos, square)
+    if kind in ('h', 'v'):
+        return ("barrier", square, ORIENTATIONS['hv'.index(kind)])
+    raise ValueError(f"Bad move notation {text!r}")
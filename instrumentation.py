@@ -0,0 +1,70 @@
+# instrumentation.py - counters and phase timers for the search engine
+#
+# Hot paths guard every update with `if instrumentation.enabled:`, so collection costs one
+# attribute check when it is off. Turn it on with enable(), run a search, then read `stats`
+# (or a searcher's lastStats) as a SearchStats object.
+import time
+
+COUNTERS = ('a_star', 'path_checks', 'distance_maps', 'clones', 'legal_moves', 'nodes_expanded', 'nodes_evicted')
+PHASES = ('selection', 'expansion', 'simulation', 'backprop')
+
+enabled = False
+clock = time.perf_counter
+
+
+class SearchStats:
+    __slots__ = COUNTERS + PHASES
+
+    def __init__(self, values=None):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+        if values:
+            self.add(values)
+
+    def add(self, other):
+        # other may be another SearchStats or the dict from asDict().
+        if isinstance(other, SearchStats):
+            other = other.asDict()
+        for name, value in other.items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def since(self, earlier):
+        # Difference between this and an earlier copy(), e.g. the work done by one search.
+        return SearchStats({name: getattr(self, name) - getattr(earlier, name) for name in self.__slots__})
+
+    def copy(self):
+        return SearchStats(self.asDict())
+
+    def asDict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name):.4f}" if name in PHASES else f"{name}={getattr(self, name)}"
+                           for name in self.__slots__)
+        return f"SearchStats({fields})"
+
+
+stats = SearchStats()
+
+
+def enable(flag=True):
+    global enabled
+    enabled = flag
+
+
+def disable():
+    enable(False)
+
+
+def reset():
+    global stats
+    stats = SearchStats()
+
+
+def workerCall(function, args, collect):
+    # Runs function(*args) in a worker process and returns (result, stats dict or None),
+    # so counters gathered in a process pool can be merged back into the parent.
+    enable(collect)
+    reset()
+    result = function(*args)
+    return result, (stats.asDict() if collect else None)
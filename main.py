@@ -1,59 +1,82 @@
-# main.py
-import pygame
+# main.py - pygame front end
+#
+# The engine modules (game_state, mcts, negamax, endgame, book, ...) never import pygame,
+# so batch workers and server.py load none of the UI. pygame and board.py are imported
+# and the window is opened only when main() runs, which keeps this module importable headless.
+import math
 import sys
-from constants import SCREEN_WIDTH, SCREEN_HEIGHT, WHITE, CELL_SIZE, GRID_SIZE
-from board import draw_board, placeBarrierAtClick, show_message
-from game_state import QuoridorState
-from mcts import MCTS_Search
+from constants import SCREEN_WIDTH, SCREEN_HEIGHT, AI_TIME_LIMIT_MS, AI_ENGINE
+from game_state import newGame
+from mcts import MCTSSearcher, BackgroundSearch
+from negamax import NegamaxSearcher
 
-pygame.font.init
-pygame.init()
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Quoridor Game")
-clock = pygame.time.Clock()
-font = pygame.font.SysFont(None, 40)
+def makeSearcher():
+    # Persistent searcher so the AI keeps its tree (or transposition table) between turns.
+    if AI_ENGINE == "negamax":
+        return NegamaxSearcher(ai_player=2, time_limit_ms=AI_TIME_LIMIT_MS)
+    return MCTSSearcher(ai_player=2, time_limit_ms=AI_TIME_LIMIT_MS)
 
-# Initial positions and state. Note: 'barriers' is now stored in currentState.
-player1_pos = (8, 4)
-player2_pos = (0, 4)
-barriers = []
-currentState = QuoridorState(player1_pos, player2_pos, barriers, player_turn=1)
+def describeMove(move):
+    if move is None:
+        return ""
+    if move[0] == "move":
+        return f"move to {move[2]}"
+    return f"{move[2]} wall at {move[1]}"
+
+def render(renderer, state, messages):
+    # Repaint only what changed since the last frame and push just those rects to the display.
+    import pygame
+    dirty = renderer.render(state.barriers, state.player1_pos, state.player2_pos,
+                            state.player1_barriers, state.player2_barriers, messages)
+    if dirty:
+        pygame.display.update(dirty)
 
 def main():
-    global currentState
+    import pygame
+    from board import BoardRenderer, placeBarrierAtClick
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Quoridor Game")
+    clock = pygame.time.Clock()
+    font = pygame.font.SysFont(None, 40)
+    renderer = BoardRenderer(screen, font)
+
+    # Initial positions and state.
+    currentState = newGame()
+    searcher = makeSearcher()
     game_running = True
     aiTurn = False
     barrierOrientation = 'horizontal'
+    # The AI's search runs on a background thread so the window keeps rendering. During the
+    # human's turn it ponders on the current position; that search is cancelled when the
+    # human moves and the tree is reused for the AI's own search.
+    aiSearch = None
+    pondering = False
 
     while game_running:
-        screen.fill(WHITE)
-        draw_board(screen, currentState.barriers, currentState.player1_pos, currentState.player2_pos, 
-                   currentState.player1_barriers, currentState.player2_barriers, font)
-        
         #Checks for winner
         if currentState.isTerminal():
+                if aiSearch is not None:
+                    aiSearch.cancel()
+                    aiSearch = None
                 winner = currentState.getWinner()
-                show_message(screen, f"Player {winner} wins!", (0, 255, 0),
-                             (SCREEN_WIDTH // 3, SCREEN_HEIGHT // 3), font)
-                pygame.display.flip()
+                render(renderer, currentState,
+                       [(f"Player {winner} wins!", (0, 255, 0), (SCREEN_WIDTH // 3, SCREEN_HEIGHT // 3))])
                 pygame.time.wait(2000)
                 game_running = False
                 continue
 
-        if aiTurn:
-            show_message(screen, "AI is thinking...", (255, 0, 0),
-                         (SCREEN_WIDTH // 3, SCREEN_HEIGHT // 3), font)
-        
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 game_running = False
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                renderer.invalidate()
 
             # Handle barrier placement.
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and not aiTurn:
                 success = placeBarrierAtClick(event.pos, barrierOrientation, currentState)
                 if success:
-                    # Barrier placement counts as a move: switch turn.
-                    currentState.player_turn = 3 - currentState.player_turn
+                    # Barrier placement counts as a move; the turn has already switched.
                     aiTurn = (currentState.player_turn == 2)  # Assume AI is player 2.
                     print("Barrier placed!")
                 else:
@@ -71,19 +94,33 @@ def main():
                 elif event.key == pygame.K_v:
                     barrierOrientation = 'vertical'
         
-        # AI turn.
+        # AI turn: start the search once, then poll it every frame.
         if aiTurn and not currentState.isTerminal():
-            print("Satring MCTS Search")
-            bestMove = MCTS_Search(currentState, iterations=2, ai_player=2) #iterations 
-            print("MCTS Search Complete")
-            currentState = currentState.applyMoves(bestMove)
-            aiTurn = False
+            if aiSearch is None or pondering:
+                if aiSearch is not None:
+                    aiSearch.cancel()
+                aiSearch = BackgroundSearch(searcher, currentState)
+                pondering = False
+            elif aiSearch.done():
+                currentState = currentState.applyMoves(aiSearch.result)
+                aiSearch = None
+                aiTurn = False
+        elif aiSearch is None and game_running and not currentState.isTerminal():
+            aiSearch = BackgroundSearch(searcher, currentState, iterations=math.inf, time_limit_ms=math.inf)
+            pondering = True
 
-        pygame.display.flip()
+        messages = []
+        if aiTurn:
+            iterations, bestMove = aiSearch.progress()
+            messages = [(f"AI is thinking... {iterations}", (255, 0, 0), (SCREEN_WIDTH // 3, SCREEN_HEIGHT // 3)),
+                        (describeMove(bestMove), (255, 0, 0), (SCREEN_WIDTH // 3, SCREEN_HEIGHT // 3 + 40))]
+        render(renderer, currentState, messages)
         clock.tick(30)
         
+    if aiSearch is not None:
+        aiSearch.cancel()
     pygame.quit()
     sys.exit()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,9 +1,20 @@
 # mcts.py - Monte Carlo Tree Search
 import math
 import random
-import copy
+import threading
+import time
+from itertools import repeat
+import instrumentation
+from book import defaultBook
+from endgame import endgameWinner
 from game_state import QuoridorState
 
+BATCH_SIZE = 64  # Rollouts per batch with batch simulation
+NODE_BYTES = 600  # Memory per tree node measured with tracemalloc, for caps given in bytes
+TRIM_TO = 0.75  # Fraction of the node cap kept after a trim
+EXPLORATION_WEIGHT = 1.0  # UCT constant used during selection
+WIDENING_BASE = 2  # Children available to an unvisited node under progressive widening
+
 def heuristic(state, player):
     player_path = state.getShortestPathLength(player)
     opponent_path = state.getShortestPathLength(3 - player)
@@ -12,116 +23,559 @@ def heuristic(state, player):
     return (opponent_path - player_path) + 0.1 * walls_left
 
 class MCTSNode:
-    def __init__(self, state, parent=None, player=None, lastMoveTaken=None):
-        self.state = state
-        self.parent = parent
-        self.children = []
+    # Nodes keep statistics only. The position is rebuilt by pushing moves onto one
+    # mutable state while walking down from the root, so no node stores a state copy.
+    __slots__ = ('player', 'key', 'visits', 'wins', 'children', 'untriedMoves', 'amaf')
+
+    def __init__(self, player, key=None):
+        # player: who made the move into this node; for the root, the AI player's perspective.
+        self.player = player
+        self.key = key  # Zobrist key of the position
         self.visits = 0
         self.wins = 0
-        self.lastMoveTaken = lastMoveTaken
-        if parent is None:
-            if player is None:
-                raise ValueError("Root node must have a player value.")
-            self.player = player  # AI player's perspective
+        self.children = {}  # move -> child node
+        self.untriedMoves = None  # Filled on first expansion, best-scoring move last
+        self.amaf = None  # With RAVE: move -> [visits, wins] for moves played later from here
+
+    def isFullyExpanded(self, widening=None):
+        # Moves are generated on first expansion, so an unexpanded node is never full. With
+        # progressive widening a node only offers ceil(WIDENING_BASE * (visits + 1) ** widening)
+        # children, the best by heuristic, and counts as full once it has that many.
+        if self.untriedMoves is None:
+            return False
+        if not self.untriedMoves:
+            return True
+        return widening is not None and len(self.children) >= math.ceil(WIDENING_BASE * (self.visits + 1) ** widening)
+
+    def _bestEdge(self, explorationWeight, raveEquivalence=None):
+        log_visits = math.log(self.visits + 1)
+        amaf = self.amaf if raveEquivalence else None
+
+        def score(edge):
+            move, child = edge
+            value = child.wins / (child.visits + 1e-6)
+            stats = amaf.get(move) if amaf else None
+            if stats:
+                # RAVE: lean on the all-moves-as-first value until the child has visits of its own.
+                beta = math.sqrt(raveEquivalence / (3 * child.visits + raveEquivalence))
+                value = (1 - beta) * value + beta * stats[1] / stats[0]
+            return value + explorationWeight * math.sqrt(log_visits / (child.visits + 1e-6))
+        return max(self.children.items(), key=score)
+
+    def bestChild(self, explorationWeight=1.0):   #EXPLORATION WEIGHT = 1.0
+        return self._bestEdge(explorationWeight)[1]
+
+    def bestMove(self, explorationWeight=0):
+        return self._bestEdge(explorationWeight)[0]
+
+    def expand(self, state, table):
+        # Adds the best remaining untried move as a child and leaves it pushed on state.
+        # table maps Zobrist keys to nodes, so a position reached by another move order
+        # is linked in as a child instead of being searched again.
+        if self.untriedMoves is None:
+            self.untriedMoves = orderedMoves(state, table.relevantWalls)
+        if table.raveEquivalence is not None and self.amaf:
+            # With RAVE, expand the move with the best AMAF value first; moves without AMAF
+            # data count as even and keep the heuristic order among themselves.
+            amaf = self.amaf
+
+            def amafValue(index):
+                stats = amaf.get(self.untriedMoves[index])
+                return (stats[1] / stats[0] if stats else 0.5), index
+            move = self.untriedMoves.pop(max(range(len(self.untriedMoves)), key=amafValue))
         else:
+            move = self.untriedMoves.pop()
+        state.push(move)
+        child_node = table.get(state.zobrist)
+        if child_node is None:
+            if instrumentation.enabled:
+                instrumentation.stats.nodes_expanded += 1
             # The move that led to this state was made by the opponent of the current turn.
-            self.player = 3 - state.player_turn
+            child_node = MCTSNode(3 - state.player_turn, state.zobrist)
+            table[state.zobrist] = child_node
+        self.children[move] = child_node
+        return move, child_node
 
-    def isFullyExpanded(self):
-        return len(self.children) == len(self.state.getLegalMoves())
+    def update(self, result):
+        self.visits += 1
+        if result == self.player:
+            self.wins += 1
 
-    def bestChild(self, explorationWeight=1.0):   #EXPLORATION WEIGHT = 1.0
-        return max(self.children, key=lambda child: (child.wins / (child.visits + 1e-6)) +
-                   explorationWeight * math.sqrt(math.log(self.visits + 1) / (child.visits + 1e-6)))
+class NodeTable(dict):
+    # Transposition table (Zobrist key -> node, root excluded) with an optional node cap.
+    # When the tree outgrows maxNodes, trim() evicts the lowest-visit subtrees off the
+    # principal variation until it is back to TRIM_TO of the cap. An evicted subtree's
+    # statistics are already counted in its parent, so only its move goes back to the
+    # parent's untried moves, to be expanded again if the search returns there. The root's
+    # children and the principal variation are kept, so the cap must leave room for them.
+    # It also carries the search settings, since every phase of the search is handed the table:
+    # the UCT exploration constant; when RAVE is on, its equivalence parameter (roughly
+    # the visit count at which a child's own value and its AMAF value weigh the same); the
+    # progressive widening exponent (see MCTSNode.isFullyExpanded); and whether expansion
+    # only generates relevant walls (QuoridorState.relevantWallMask).
+    def __init__(self, maxNodes=None, explorationWeight=EXPLORATION_WEIGHT, raveEquivalence=None, widening=None,
+                 relevantWalls=False):
+        super().__init__()
+        self.maxNodes = maxNodes
+        self.explorationWeight = explorationWeight
+        self.raveEquivalence = raveEquivalence
+        self.widening = widening
+        self.relevantWalls = relevantWalls
+        self.evicted = 0  # Nodes dropped by trim() so far
 
-    def expand(self):
-        legal_moves = self.state.getLegalMoves()
-        existing_states = [child.state for child in self.children]
+    def full(self):
+        return self.maxNodes is not None and len(self) >= self.maxNodes
 
-        unvisited_moves = []
-        for move in legal_moves:
-            new_state = self.state.applyMoves(move)
-            if new_state not in existing_states:
-                unvisited_moves.append((move, new_state))
+    def rebuild(self, rootNode):
+        # Keep only the nodes reachable from rootNode.
+        self.clear()
+        stack = [rootNode]
+        while stack:
+            for child in stack.pop().children.values():
+                if child is not rootNode and child.key not in self:
+                    self[child.key] = child
+                    stack.append(child)
 
-        if not unvisited_moves:
-            print("All moves already expanded. Returning random child.")
-            return random.choice(self.children)  # Fallback if all moves visited
+    def trim(self, rootNode):
+        before = len(self)
+        target = int(self.maxNodes * TRIM_TO)
+        # Breadth-first spanning tree: shallowest depth, one tree parent and the subtree
+        # size of every node, plus every parent edge for unlinking.
+        depth = {id(rootNode): 0}
+        order = [rootNode]
+        treeChildren = {}
+        parents = {}
+        for node in order:
+            kids = treeChildren[id(node)] = []
+            for move, child in node.children.items():
+                parents.setdefault(id(child), []).append((node, move))
+                if id(child) not in depth:
+                    depth[id(child)] = depth[id(node)] + 1
+                    order.append(child)
+                    kids.append(child)
+        size = {}
+        for node in reversed(order):
+            size[id(node)] = 1 + sum(size[id(child)] for child in treeChildren[id(node)])
+
+        # The principal variation and the root's own moves are never evicted.
+        protected = {id(rootNode)}
+        protected.update(id(child) for child in rootNode.children.values())
+        node = rootNode
+        seen = set()
+        while node.children and id(node) not in seen:
+            seen.add(id(node))
+            node = max(node.children.values(), key=lambda child: child.visits)
+            protected.add(id(node))
+
+        victims = sorted((node for node in order if id(node) not in protected),
+                         key=lambda node: (node.visits, -depth[id(node)]))
+        removed = set()
+        freed = 0
+        for victim in victims:
+            if freed >= before - target:
+                break
+            if id(victim) in removed:
+                continue
+            for parent, move in parents[id(victim)]:
+                if parent.children.get(move) is victim:
+                    del parent.children[move]
+                    if parent.untriedMoves is not None:
+                        parent.untriedMoves.insert(0, move)
+            stack = [victim]
+            while stack:
+                node = stack.pop()
+                removed.add(id(node))
+                stack.extend(treeChildren[id(node)])
+            freed += size[id(victim)]
+        self.rebuild(rootNode)
+        evicted = before - len(self)
+        self.evicted += evicted
+        if instrumentation.enabled:
+            instrumentation.stats.nodes_evicted += evicted
+        return evicted
+
+def orderedMoves(state, relevantOnly=False):
+    # Legal moves sorted by heuristic for the side to move, best last so expansion can pop() it.
+    current_player = state.player_turn
+    scored = []
+    for move in state.getLegalMoves(relevantOnly):
+        state.push(move)
+        scored.append((heuristic(state, current_player), len(scored), move))
+        state.pop()
+    # Equal scores keep generation order, first-generated expanded first.
+    scored.sort(key=lambda entry: (entry[0], -entry[1]))
+    return [move for _, _, move in scored]
+
+def playout(currentState, moves=None):
+    # Greedy playout by heuristic, ties broken at random. Runs in place on the given
+    # state and unwinds it afterwards; returns (winner, plies played). Module-level so
+    # worker processes can run it. The moves played are appended to moves if given.
+    # Only relevant walls are scored: a wall can only beat a step along the shortest path
+    # by cutting the opponent's path, and those walls are always relevant, so the greedy
+    # choice is unchanged. Positions endgame.py can settle end the playout early.
+    depth = 0
+    while True:
+        winner = endgameWinner(currentState)
+        if winner is not None:
+            break
+        legal_moves = currentState.getLegalMoves(relevantOnly=True)
+        if not legal_moves:
+            break
 
-        # Pick best unvisited move based on heuristic (optional)
         best_score = -float('inf')
-        best_move = None
-        best_state = None
-        current_player = self.state.player_turn
+        best_moves = []
+        current_player = currentState.player_turn
 
-        for move, new_state in unvisited_moves:
-            score = heuristic(new_state, current_player)
+        for move in legal_moves:
+            currentState.push(move)
+            score = heuristic(currentState, current_player)
+            currentState.pop()
             if score > best_score:
                 best_score = score
-                best_move = move
-                best_state = new_state
-
-        # Add child
-        child_node = MCTSNode(best_state, parent=self, lastMoveTaken=best_move)
-        self.children.append(child_node)
-        #print(f"Expanding node with barriers: {best_state.barriers}")  # NEW barriers checked
-        return child_node
-
-    def simulate(self):
-        currentState = copy.deepcopy(self.state)
-        #print(f"Simulating from state with barriers: {currentState.barriers}")
-        while not currentState.isTerminal():
-            legal_moves = currentState.getLegalMoves()
-            if not legal_moves:
-                break
-            
-            best_score = -float('inf')
-            best_move = None
-            current_player = currentState.player_turn
-
-            for move in legal_moves:
-                if move[0] == "move":
-                    next_state = currentState.applyMoves(move)
-                    score = heuristic(next_state, current_player)
-                elif move[0] == "barrier":
-                    next_state = currentState.applyMoves(move)
-                    score = heuristic(next_state, current_player)
-                if score > best_score:
-                    best_score = score
-                    best_move = move
-
-            if best_move:
-                currentState = currentState.applyMoves(best_move)
-            else:
-                break
-        
-        return currentState.getWinner()
+                best_moves = [move]
+            elif score == best_score:
+                best_moves.append(move)
 
-    def backpropagate(self, result):
-        self.visits += 1
-        if self.player is not None and result == self.player:
-            self.wins += 1
-        if self.parent:
-            self.parent.backpropagate(result)
+        move = random.choice(best_moves)
+        currentState.push(move)
+        if moves is not None:
+            moves.append(move)
+        depth += 1
 
-def MCTS_Search(rootState, iterations=2, ai_player=2): #iterations
-    if rootState.isTerminal():
-        return rootState.player2_pos
-    
-    rootNode = MCTSNode(rootState, player=ai_player)
-    for i in range(iterations):
-        print(f"Starting iteration: {i}")
-        node = rootNode
-        # Selection
-        while node.isFullyExpanded() and not node.state.isTerminal():
-            node = node.bestChild()
-        # Expansion
-        if not node.state.isTerminal():
-            node = node.expand()
+    for _ in range(depth):
+        currentState.pop()
+    return winner, depth
+
+def _selectLeaf(rootNode, state, table):
+    # Walks down from the root, pushing each chosen move onto state. Returns the leaf and the
+    # path to it; the caller pops len(path) - 1 moves once it is done with the leaf position.
+    timed = instrumentation.enabled
+    if timed:
+        start = instrumentation.clock()
+    node = rootNode
+    path = [node]
+    # Selection. Transpositions can form cycles, so stop at a node already on the path.
+    # Positions with a known result are leaves: the playout from them returns at once. The
+    # root is expanded even when decided, since the search still has to pick a move there.
+    while node.isFullyExpanded(table.widening) and (node is rootNode or endgameWinner(state) is None):
+        move, child = node._bestEdge(table.explorationWeight, table.raveEquivalence)
+        if child in path:
+            break
+        state.push(move)
+        node = child
+        path.append(node)
+    if timed:
+        selected = instrumentation.clock()
+        instrumentation.stats.selection += selected - start
+    # Expansion
+    if (node is rootNode or endgameWinner(state) is None) and not node.isFullyExpanded(table.widening):
+        move, child = node.expand(state, table)
+        if child in path:
+            state.pop()
+        else:
+            node = child
+            path.append(node)
+    if timed:
+        instrumentation.stats.expansion += instrumentation.clock() - selected
+    return node, path
+
+def _unwind(state, path):
+    # Pops the moves pushed while walking down path and returns them in the order played.
+    moves = [state.pop() for _ in range(len(path) - 1)]
+    moves.reverse()
+    return moves
+
+def _updateAmaf(path, moves, result, rootMover):
+    # All-moves-as-first: credit each node's AMAF entry for every move its side to move
+    # played at any later point of the iteration, first occurrence only. moves starts
+    # with the move out of path[0]; the side to move alternates from rootMover.
+    for i, node in enumerate(path):
+        mover = rootMover if i % 2 == 0 else 3 - rootMover
+        if node.amaf is None:
+            node.amaf = {}
+        seen = set()
+        for move in moves[i::2]:
+            if move in seen:
+                continue
+            seen.add(move)
+            stats = node.amaf.get(move)
+            if stats is None:
+                stats = node.amaf[move] = [0, 0]
+            stats[0] += 1
+            if result == mover:
+                stats[1] += 1
+
+def _budgetLeft(done, iterations, deadline, stop=None):
+    # With a deadline the iteration count is ignored; at least one iteration always runs
+    # unless the search is cancelled through the stop event.
+    if stop is not None and stop.is_set():
+        return False
+    if deadline is None:
+        return done < iterations
+    return done == 0 or time.monotonic() < deadline
+
+def _deadline(time_limit_ms):
+    return None if time_limit_ms is None else time.monotonic() + time_limit_ms / 1000
+
+def _runIterations(rootNode, state, table, iterations, deadline=None, stop=None):
+    # Returns (iterations run, rollout plies played).
+    i = 0
+    plies = 0
+    rootMover = state.player_turn
+    rave = table.raveEquivalence is not None
+    while _budgetLeft(i, iterations, deadline, stop):
+        node, path = _selectLeaf(rootNode, state, table)
+        timed = instrumentation.enabled
+        if timed:
+            start = instrumentation.clock()
         #simulate
-        result = node.simulate()
-        #backpropogate
-        node.backpropagate(result)
-    #chooses best move
-    bestMoveNode = rootNode.bestChild(explorationWeight=0)
-    return bestMoveNode.lastMoveTaken
\ No newline at end of file
+        rolloutMoves = [] if rave else None
+        result, depth = playout(state, rolloutMoves)
+        plies += depth
+        treeMoves = _unwind(state, path)
+        if timed:
+            simulated = instrumentation.clock()
+            instrumentation.stats.simulation += simulated - start
+        #backpropogate along the path taken; a node can have several parents.
+        for pathNode in path:
+            pathNode.update(result)
+        if rave:
+            _updateAmaf(path, treeMoves + rolloutMoves, result, rootMover)
+        if timed:
+            instrumentation.stats.backprop += instrumentation.clock() - simulated
+        i += 1
+        if table.full():
+            table.trim(rootNode)
+    return i, plies
+
+def _runLeafParallel(rootNode, state, table, iterations, executor, batchSize, deadline=None, stop=None):
+    # With RAVE only the tree moves are credited; rollouts run elsewhere and report no moves.
+    done = 0
+    plies = 0
+    rootMover = state.player_turn
+    while _budgetLeft(done, iterations, deadline, stop):
+        paths = []
+        states = []
+        treeMoves = []
+        batch = batchSize if deadline is not None else min(batchSize, iterations - done)
+        for _ in range(batch):
+            node, path = _selectLeaf(rootNode, state, table)
+            states.append(state.clone())
+            treeMoves.append(_unwind(state, path))
+            # Virtual loss: count the visit now, so the next selection in this batch
+            # sees a worse win rate along this path and picks a different leaf.
+            for pathNode in path:
+                pathNode.visits += 1
+            paths.append(path)
+        timed = instrumentation.enabled
+        if timed:
+            start = instrumentation.clock()
+        if executor is None:
+            # Batched NumPy playouts in this process (parallel='batch'), seeded from the
+            # random module so a seeded run stays reproducible.
+            import batchsim
+            outcomes = [(outcome, None) for outcome in batchsim.batchPlayouts(states, seed=random.getrandbits(64))]
+        else:
+            outcomes = list(executor.map(instrumentation.workerCall, repeat(playout), ((s,) for s in states),
+                                         repeat(timed)))
+        if timed:
+            instrumentation.stats.simulation += instrumentation.clock() - start
+        for path, moves, ((result, depth), workerStats) in zip(paths, treeMoves, outcomes):
+            plies += depth
+            if workerStats:
+                instrumentation.stats.add(workerStats)
+            # The visit was already counted by the virtual loss; only credit the win.
+            for pathNode in path:
+                if result == pathNode.player:
+                    pathNode.wins += 1
+            if table.raveEquivalence is not None:
+                _updateAmaf(path, moves, result, rootMover)
+        done += len(paths)
+        if table.full():
+            table.trim(rootNode)
+    return done, plies
+
+def _rootChildStats(rootState, iterations, ai_player, seed, deadline=None, table=None):
+    # Root-parallel worker: search an independent tree and report the root edges. table is
+    # an empty NodeTable carrying the search settings.
+    random.seed(seed)
+    rootNode = MCTSNode(ai_player, rootState.zobrist)
+    _runIterations(rootNode, rootState, NodeTable() if table is None else table, iterations, deadline)
+    return {move: (child.visits, child.wins) for move, child in rootNode.children.items()}
+
+def _bookMove(state):
+    openingBook = defaultBook()
+    return openingBook.lookup(state) if openingBook is not None else None
+
+def MCTS_Search(rootState, iterations=2, ai_player=2, workers=1, parallel='root', batchSize=None, executor=None,
+                time_limit_ms=None, useBook=True, maxNodes=None, explorationWeight=EXPLORATION_WEIGHT,
+                raveEquivalence=None, widening=None, relevantWalls=False): #iterations
+    # workers > 1 spreads the search over processes. parallel='root' runs one tree per worker
+    # (iterations split between them) and merges the root statistics; parallel='leaf' keeps
+    # one tree and farms batches of rollouts out to the pool. An existing executor can be passed in.
+    # parallel='batch' keeps one tree and plays each batch of rollouts in lockstep with
+    # batchsim.py (needs NumPy) in this process; workers is ignored.
+    # time_limit_ms replaces the iteration count with a wall-clock budget. Positions found in
+    # the opening book (book.py) are answered from it without searching. maxNodes caps the
+    # size of each tree; explorationWeight is the UCT constant, raveEquivalence turns on
+    # RAVE, widening turns on progressive widening and relevantWalls prunes irrelevant
+    # walls at expansion (see NodeTable). Returns None if the game is already over.
+    if rootState.isTerminal():
+        return None
+    if useBook:
+        bookMove = _bookMove(rootState)
+        if bookMove is not None:
+            return bookMove
+
+    deadline = _deadline(time_limit_ms)
+    table = NodeTable(maxNodes, explorationWeight, raveEquivalence, widening, relevantWalls)
+    # The search pushes and pops moves on its own copy of the root position.
+    state = rootState.clone()
+    if parallel == 'batch':
+        rootNode = MCTSNode(ai_player, state.zobrist)
+        _runLeafParallel(rootNode, state, table, iterations, None, batchSize or BATCH_SIZE, deadline)
+        return rootNode.bestMove(explorationWeight=0)
+    if workers <= 1 and executor is None:
+        rootNode = MCTSNode(ai_player, state.zobrist)
+        _runIterations(rootNode, state, table, iterations, deadline)
+        #chooses best move
+        return rootNode.bestMove(explorationWeight=0)
+
+    ownsExecutor = executor is None
+    if ownsExecutor:
+        # Imported here: multiprocessing is slow to import and most callers search in-process.
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        if parallel == 'leaf':
+            rootNode = MCTSNode(ai_player, state.zobrist)
+            _runLeafParallel(rootNode, state, table, iterations, executor, batchSize or workers, deadline)
+            return rootNode.bestMove(explorationWeight=0)
+        if parallel != 'root':
+            raise ValueError(f"Unknown parallel mode: {parallel}")
+
+        shares = [iterations // workers + (i < iterations % workers) for i in range(workers)]
+        seeds = [random.getrandbits(32) for _ in range(workers)]
+        futures = [executor.submit(instrumentation.workerCall, _rootChildStats,
+                                   (state, share, ai_player, seed, deadline, table), instrumentation.enabled)
+                   for share, seed in zip(shares, seeds) if share > 0 or deadline is not None]
+        merged = {}
+        for future in futures:
+            edges, workerStats = future.result()
+            if workerStats:
+                instrumentation.stats.add(workerStats)
+            for move, (visits, wins) in edges.items():
+                totalVisits, totalWins = merged.get(move, (0, 0))
+                merged[move] = (totalVisits + visits, totalWins + wins)
+        return max(merged, key=lambda move: merged[move][1] / (merged[move][0] + 1e-6))
+    finally:
+        if ownsExecutor:
+            executor.shutdown()
+
+class MCTSSearcher:
+    # Keeps one tree across turns. Each search() re-roots onto the node for the given
+    # position (normally the grandchild reached by our move and the opponent's reply)
+    # and keeps its statistics; unknown positions start a fresh tree. maxNodes or maxBytes
+    # bounds the tree for long-running use; the other keyword arguments are the search
+    # settings (see NodeTable).
+    def __init__(self, ai_player=2, iterations=2, time_limit_ms=None, executor=None, batchSize=None, useBook=True,
+                 batchSimulation=False, maxNodes=None, maxBytes=None, explorationWeight=EXPLORATION_WEIGHT,
+                 raveEquivalence=None, widening=None, relevantWalls=False):
+        self.ai_player = ai_player
+        self.useBook = useBook
+        self.iterations = iterations
+        self.time_limit_ms = time_limit_ms
+        self.executor = executor  # Optional pool for leaf-parallel rollouts.
+        self.batchSize = batchSize
+        self.batchSimulation = batchSimulation  # Play rollouts in NumPy batches (batchsim.py)
+        self.rootNode = None
+        self.rootState = None
+        if maxNodes is None and maxBytes is not None:
+            maxNodes = max(1, maxBytes // NODE_BYTES)
+        self.table = NodeTable(maxNodes, explorationWeight, raveEquivalence, widening, relevantWalls)
+        # Work done by the most recent search(); lastStats is only filled while
+        # instrumentation is enabled.
+        self.lastIterations = 0
+        self.lastRolloutPlies = 0
+        self.lastStats = None
+
+    def reroot(self, state):
+        node = self.table.get(state.zobrist) if self.rootNode is not None else None
+        if node is None:
+            node = MCTSNode(self.ai_player, state.zobrist)
+        self.rootNode = node
+        self.rootState = state.clone()
+        # Drop everything no longer reachable from the new root.
+        self.table.rebuild(node)
+        return node
+
+    def treeSize(self):
+        return len(self.table) + (self.rootNode is not None)
+
+    def evictions(self):
+        return self.table.evicted
+
+    def search(self, state, iterations=None, time_limit_ms=None, stop=None):
+        # stop is an optional threading.Event that cancels the search early. Pass
+        # iterations=math.inf and time_limit_ms=math.inf to search until stopped.
+        # Returns None if the game is over or the search was cancelled before any move was expanded.
+        # The counters are cleared first so a finished game or book move reports no work.
+        self.lastIterations = self.lastRolloutPlies = 0
+        self.lastStats = None
+        if state.isTerminal():
+            return None
+        if self.useBook:
+            bookMove = _bookMove(state)
+            if bookMove is not None:
+                return bookMove
+        rootNode = self.reroot(state)
+        iterations = self.iterations if iterations is None else iterations
+        deadline = _deadline(self.time_limit_ms if time_limit_ms is None else time_limit_ms)
+        before = instrumentation.stats.copy() if instrumentation.enabled else None
+        if self.batchSimulation:
+            work = _runLeafParallel(rootNode, self.rootState, self.table, iterations, None,
+                                    self.batchSize or BATCH_SIZE, deadline, stop)
+        elif self.executor is None:
+            work = _runIterations(rootNode, self.rootState, self.table, iterations, deadline, stop)
+        else:
+            work = _runLeafParallel(rootNode, self.rootState, self.table, iterations, self.executor,
+                                    self.batchSize or 1, deadline, stop)
+        self.lastIterations, self.lastRolloutPlies = work
+        self.lastStats = instrumentation.stats.since(before) if before is not None else None
+        return rootNode.bestMove(explorationWeight=0) if rootNode.children else None
+
+    def progress(self):
+        # (root visits, current best move) for the tree being searched. Safe to call from
+        # another thread while search() runs; the children are snapshotted first.
+        rootNode = self.rootNode
+        if rootNode is None:
+            return 0, None
+        edges = list(rootNode.children.items())
+        if not edges:
+            return rootNode.visits, None
+        return rootNode.visits, max(edges, key=lambda edge: edge[1].wins / (edge[1].visits + 1e-6))[0]
+
+class BackgroundSearch:
+    # Runs searcher.search() on a daemon thread. Poll done()/progress() from the caller's
+    # loop, read result once done, or cancel() to stop early and wait for the thread.
+    def __init__(self, searcher, state, iterations=None, time_limit_ms=None):
+        self.searcher = searcher
+        self.result = None
+        self._stop = threading.Event()
+        # Clone now: the caller keeps mutating its own state while we search.
+        self._thread = threading.Thread(target=self._run, args=(state.clone(), iterations, time_limit_ms),
+                                        daemon=True)
+        self._thread.start()
+
+    def _run(self, state, iterations, time_limit_ms):
+        self.result = self.searcher.search(state, iterations, time_limit_ms, stop=self._stop)
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    def progress(self):
+        return self.searcher.progress()
+
+    def cancel(self):
+        self._stop.set()
+        self._thread.join()
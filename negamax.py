@@ -0,0 +1,220 @@
+# negamax.py - alpha-beta negamax search with iterative deepening
+#
+# An alternative to mcts.py with the same calling conventions: Negamax_Search() mirrors
+# MCTS_Search() and NegamaxSearcher mirrors MCTSSearcher, so callers switch engines by config.
+# Depth-first with a Zobrist-keyed transposition table, killer and history move ordering,
+# and only the walls that cut the opponent's shortest path are searched.
+import math
+import time
+import instrumentation
+from book import defaultBook
+from mcts import orderedMoves
+
+WIN_SCORE = 1000
+DEFAULT_DEPTH = 3  # Depth searched when there is no time limit
+MAX_DEPTH = 64
+WIN_BOUND = WIN_SCORE - MAX_DEPTH  # Scores at or beyond this are forced wins or losses
+TABLE_LIMIT = 1 << 20  # Transposition table entries kept before it is cleared
+CHECK_INTERVAL = 256  # Nodes between clock checks
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def evaluate(state):
+    # Path difference for the side to move. mcts.heuristic() also adds 0.1 per wall in hand
+    # for the mover only, which is not zero-sum; negamax needs score(A) == -score(B).
+    player = state.player_turn
+    return state.getShortestPathLength(3 - player) - state.getShortestPathLength(player)
+
+
+def _toTable(score, ply):
+    # Win and loss scores count plies from the root. The table stores them counted from the
+    # node instead, so an entry stays right at another ply or on a later turn.
+    if score >= WIN_BOUND:
+        return score + ply
+    if score <= -WIN_BOUND:
+        return score - ply
+    return score
+
+
+def _fromTable(score, ply):
+    if score >= WIN_BOUND:
+        return score - ply
+    if score <= -WIN_BOUND:
+        return score + ply
+    return score
+
+
+def candidateMoves(state):
+    # Pawn steps plus the walls that cut the opponent's current shortest path; any other
+    # wall leaves the opponent's distance unchanged and is not worth a branch.
+    cell = state.player1_cell if state.player_turn == 1 else state.player2_cell
+    moves = [move for _, blockers, move in state.board.pawnMoves[cell] if not state.walls & blockers]
+    if state.wallsRemaining(state.player_turn) > 0:
+        within = state.shortestPathBlockers(3 - state.player_turn)
+        wall_moves = state.board.wallMoves
+        moves.extend(wall_moves[slot] for slot in state.legalWallSlots(within))
+    return moves
+
+
+class NegamaxSearcher:
+    # Keeps its transposition table and history scores between turns. iterations is the
+    # maximum depth; if None, DEFAULT_DEPTH without a time limit, else deepen until the deadline.
+    def __init__(self, ai_player=2, iterations=None, time_limit_ms=None, useBook=True):
+        self.ai_player = ai_player
+        self.iterations = iterations
+        self.time_limit_ms = time_limit_ms
+        self.useBook = useBook
+        self.table = {}  # Zobrist key -> (depth, score, flag, best move)
+        self.history = {}  # move -> cutoff score
+        self.killers = []  # per ply: up to two quiet moves that caused a cutoff
+        self.bestMove = None
+        self.depth = 0
+        # Same fields as MCTSSearcher; lastIterations counts nodes searched.
+        self.lastIterations = 0
+        self.lastRolloutPlies = 0
+        self.lastStats = None
+        self._nodes = 0
+        self._deadline = None
+        self._stop = None
+
+    def _checkBudget(self):
+        if ((self._deadline is not None and time.monotonic() >= self._deadline) or
+                (self._stop is not None and self._stop.is_set())):
+            raise SearchTimeout()
+
+    def _orderMoves(self, moves, ttMove, ply):
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        history = self.history
+
+        def score(move):
+            if move == ttMove:
+                return math.inf
+            if move in killers:
+                return 1e9
+            return history.get(move, 0)
+        moves.sort(key=score, reverse=True)
+        return moves
+
+    def _storeKiller(self, move, ply):
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+
+    def _negamax(self, state, depth, alpha, beta, ply):
+        self._nodes += 1
+        if self._nodes % CHECK_INTERVAL == 0:
+            self._checkBudget()
+        if state.isTerminal():
+            # The side to move has lost; prefer the quickest win and slowest loss.
+            return -WIN_SCORE + ply
+        if depth == 0:
+            return evaluate(state)
+
+        alpha_start = alpha
+        entry = self.table.get(state.zobrist)
+        ttMove = None
+        if entry is not None:
+            entry_depth, entry_score, flag, ttMove = entry
+            entry_score = _fromTable(entry_score, ply)
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return entry_score
+                if flag == LOWER:
+                    alpha = max(alpha, entry_score)
+                else:
+                    beta = min(beta, entry_score)
+                if alpha >= beta:
+                    return entry_score
+
+        best_score = -math.inf
+        best_move = None
+        for move in self._orderMoves(candidateMoves(state), ttMove, ply):
+            state.push(move)
+            try:
+                score = -self._negamax(state, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                state.pop()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self._storeKiller(move, ply)
+                self.history[move] = self.history.get(move, 0) + depth * depth
+                break
+        if best_move is None:
+            return evaluate(state)
+
+        if best_score <= alpha_start:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        if len(self.table) >= TABLE_LIMIT:
+            self.table.clear()
+        self.table[state.zobrist] = (depth, _toTable(best_score, ply), flag, best_move)
+        return best_score
+
+    def search(self, state, iterations=None, time_limit_ms=None, stop=None):
+        # Iterative deepening; returns the best move of the deepest completed iteration,
+        # or None if the game is over or the search was cancelled before the first one finished.
+        # The counters are cleared first so a finished game or book move reports no work.
+        self.lastIterations = self.lastRolloutPlies = 0
+        self.lastStats = None
+        if state.isTerminal():
+            return None
+        if self.useBook:
+            book = defaultBook()
+            bookMove = book.lookup(state) if book is not None else None
+            if bookMove is not None:
+                return bookMove
+        time_limit_ms = self.time_limit_ms if time_limit_ms is None else time_limit_ms
+        max_depth = self.iterations if iterations is None else iterations
+        if max_depth is None:
+            max_depth = DEFAULT_DEPTH if time_limit_ms is None else MAX_DEPTH
+        # Win scores are only recognised within MAX_DEPTH plies (see WIN_BOUND), so pondering
+        # with iterations=math.inf stops there too.
+        max_depth = min(max_depth, MAX_DEPTH)
+        self._deadline = None if time_limit_ms is None else time.monotonic() + time_limit_ms / 1000
+        self._stop = stop
+        self._nodes = 0
+        self.killers = []
+        self.bestMove = None
+        self.depth = 0
+        before = instrumentation.stats.copy() if instrumentation.enabled else None
+        root = state.clone()
+        depth = 1
+        try:
+            while depth <= max_depth:
+                score = self._negamax(root, depth, -math.inf, math.inf, 0)
+                self.bestMove = self.table[root.zobrist][3]
+                self.depth = depth
+                if abs(score) >= WIN_BOUND:
+                    break  # Forced result found; deeper iterations cannot change it.
+                depth += 1
+        except SearchTimeout:
+            if self.bestMove is None and (stop is None or not stop.is_set()):
+                # Out of time before depth 1 finished: fall back to the greedy choice.
+                self.bestMove = orderedMoves(state)[-1]
+        self.lastIterations = self._nodes
+        self.lastStats = instrumentation.stats.since(before) if before is not None else None
+        return self.bestMove
+
+    def progress(self):
+        # (completed depth, current best move); safe to call from another thread.
+        return self.depth, self.bestMove
+
+
+def Negamax_Search(rootState, iterations=None, ai_player=2, time_limit_ms=None, useBook=True):
+    searcher = NegamaxSearcher(ai_player, iterations, time_limit_ms, useBook)
+    return searcher.search(rootState)
@@ -0,0 +1,134 @@
+# records.py - compact binary game records
+#
+# A record file is append-only: the magic b"QGR1" once, then one entry per game:
+#   uint8 winner (0 = unfinished/draw), uint16 move count, one byte per move
+# where each byte is encodeMove() of the move (0-3 pawn step, 4 + wall slot). Games start
+# from the standard position with player 1 to move, so nothing else needs storing; records
+# are for the standard GRID_SIZE board only.
+# Readers stream entries one at a time, so files of millions of games never load whole.
+#   python records.py stats games.qgr
+import argparse
+import json
+import os
+import struct
+from game_state import newGame, encodeMove, decodeMove, moveToNotation, STEP_OFFSETS, MOVE_CODES, WALL_MOVES
+
+MAGIC = b"QGR1"
+GAME_HEADER = struct.Struct("<BH")
+STEP_NAMES = ("up", "down", "left", "right")
+
+
+def startState():
+    return newGame()
+
+
+def packMoves(moves):
+    return bytes(encodeMove(move) for move in moves)
+
+
+class GameWriter:
+    def __init__(self, path):
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+
+    def write(self, codes, winner=None):
+        # codes: bytes from packMoves(), or a list of moves.
+        if not isinstance(codes, (bytes, bytearray)):
+            codes = packMoves(codes)
+        # One write per game keeps a crash from leaving a header without its moves.
+        self._file.write(GAME_HEADER.pack(winner or 0, len(codes)) + codes)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def readGames(path):
+    # Yields (winner or None, move codes as bytes) for each game in the file.
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a game record file")
+        while True:
+            header = f.read(GAME_HEADER.size)
+            if len(header) < GAME_HEADER.size:
+                return  # End of file, or a torn final entry
+            winner, count = GAME_HEADER.unpack(header)
+            codes = f.read(count)
+            if len(codes) < count:
+                return
+            yield winner or None, codes
+
+
+def replay(codes, state=None):
+    # Yields (move, state) after each move. The same state object is updated in place,
+    # so clone() it to keep a position.
+    state = startState() if state is None else state
+    for code in codes:
+        move = decodeMove(code, state)
+        state.push(move)
+        yield move, state
+
+
+def codeName(code):
+    # Pawn steps depend on where the pawn stands, so they are named by direction.
+    return STEP_NAMES[code] if code < len(STEP_OFFSETS) else moveToNotation(WALL_MOVES[code - len(STEP_OFFSETS)])
+
+
+def corpusStats(path, plies=None):
+    # Move frequency and outcome statistics in fixed-size tables, whatever the file size.
+    # plies: only count moves within the first `plies` plies of each game.
+    games = 0
+    wins = [0, 0, 0]  # draws/unfinished, player 1, player 2
+    total_moves = 0
+    counts = [[0] * MOVE_CODES for _ in range(2)]  # per player, per move code
+    mover_wins = [[0] * MOVE_CODES for _ in range(2)]
+    for winner, codes in readGames(path):
+        games += 1
+        wins[winner or 0] += 1
+        total_moves += len(codes)
+        for ply, code in enumerate(codes[:plies] if plies is not None else codes):
+            mover = ply % 2
+            counts[mover][code] += 1
+            if winner == mover + 1:
+                mover_wins[mover][code] += 1
+
+    moves = {}
+    for code in range(MOVE_CODES):
+        played = counts[0][code] + counts[1][code]
+        if played:
+            moves[codeName(code)] = {"count": played, "player1": counts[0][code], "player2": counts[1][code],
+                                     "mover_win_rate": (mover_wins[0][code] + mover_wins[1][code]) / played}
+    return {
+        "games": games,
+        "player1_wins": wins[1],
+        "player2_wins": wins[2],
+        "draws": wins[0],
+        "avg_plies": total_moves / games if games else 0.0,
+        "moves": dict(sorted(moves.items(), key=lambda item: -item[1]["count"])),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Game record tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    stats = commands.add_parser("stats", help="move frequency and outcome statistics")
+    stats.add_argument("path")
+    stats.add_argument("--plies", type=int, help="only count moves in the first N plies")
+    count = commands.add_parser("count", help="number of games and file size")
+    count.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        print(json.dumps(corpusStats(args.path, args.plies), indent=2))
+    else:
+        print(json.dumps({"games": sum(1 for _ in readGames(args.path)), "bytes": os.path.getsize(args.path)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# selfcheck.py - consistency checks for the engine's cached fast paths
+#
+# legalWallSlots() answers from a per-wall-mask layout (game_state.wallLayout(): union-find
+# candidates plus cut-off cell masks). This replays random games across board sizes and
+# compares it, with and without a within mask, against a direct check of every slot:
+# its conflict mask plus pathExists() for both pawns. Exits non-zero on the first mismatch.
+#   python selfcheck.py --games 50 --sizes 2,3,5,9,11
+import argparse
+import json
+import random
+import sys
+from game_state import newGame, pathExists
+
+DEFAULT_SIZES = (2, 3, 4, 5, 9, 11)
+WALL_BIAS = 0.6  # Chance of playing a wall when one is legal, to reach dense layouts
+
+
+def directWallSlots(state):
+    board = state.board
+    slots = []
+    for slot, (_, _, _, bit, conflicts) in enumerate(board.wallSlots):
+        if state.walls & conflicts:
+            continue
+        walls = state.walls | bit
+        if (pathExists(walls, state.player1_cell, 0, board) and
+                pathExists(walls, state.player2_cell, board.size - 1, board)):
+            slots.append(slot)
+    return slots
+
+
+def checkWallLegality(sizes=DEFAULT_SIZES, games=50, seed=0, max_plies=120):
+    # Returns the number of positions checked; raises AssertionError on a mismatch.
+    rng = random.Random(seed)
+    checked = 0
+    for size in sizes:
+        for _ in range(games):
+            state = newGame(size)
+            board = state.board
+            for _ in range(max_plies):
+                if state.isTerminal():
+                    break
+                if state.wallsRemaining(state.player_turn):
+                    expected = directWallSlots(state)
+                    within = rng.getrandbits(2 * board.cellCount)
+                    assert list(state.legalWallSlots()) == expected, f"legalWallSlots() at {state.toNotation()}"
+                    assert list(state.legalWallSlots(within)) == [
+                        slot for slot in expected if board.wallSlots[slot][3] & within
+                    ], f"legalWallSlots(within={within:#x}) at {state.toNotation()}"
+                    checked += 1
+                moves = state.getLegalMoves()
+                walls = [move for move in moves if move[0] == "barrier"]
+                state.push(rng.choice(walls) if walls and rng.random() < WALL_BIAS else rng.choice(moves))
+    return checked
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Engine consistency checks")
+    parser.add_argument("--games", type=int, default=50, help="random games per board size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sizes", type=lambda text: [int(size) for size in text.split(",")],
+                        default=list(DEFAULT_SIZES), help="comma-separated board sizes")
+    args = parser.parse_args(argv)
+    try:
+        checked = checkWallLegality(args.sizes, args.games, args.seed)
+    except AssertionError as error:
+        print(f"wall legality mismatch: {error}")
+        return 1
+    print(json.dumps({"wall_legality": {"positions": checked, "sizes": args.sizes, "seed": args.seed}}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+# server.py - headless engine server
+#
+# Speaks a line-based protocol over stdin/stdout (--stdio) and/or a local TCP socket (--port).
+# Requests from every client share one process pool and are queued round-robin per client,
+# so a client that pipelines a large batch cannot starve the others. Replies can arrive
+# out of order and carry the request id.
+#
+#   go <id> <position> [ms=<n>] [iterations=<n>]   ->  bestmove <id> <move>
+#   ping                                            ->  pong
+#   quit                                            ->  closes this client
+#
+# <position> is QuoridorState.toNotation() (e.g. 8.4/0.4/1/10/10/-) and <move> is
+# moveToNotation() (m7.4, h3.3, v4.5). The engine searches for the side to move.
+# Errors are reported as "error <id> <message>". pygame is never imported.
+import argparse
+import asyncio
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from game_state import stateFromNotation, moveToNotation
+from mcts import MCTS_Search
+
+DEFAULT_TIME_MS = 1000
+
+
+def searchJob(notation, time_limit_ms, iterations):
+    # Runs in a pool worker.
+    state = stateFromNotation(notation)
+    if state.isTerminal():
+        raise ValueError("position is already decided")
+    if iterations is not None:
+        move = MCTS_Search(state, iterations=iterations, ai_player=state.player_turn)
+    else:
+        move = MCTS_Search(state, ai_player=state.player_turn, time_limit_ms=time_limit_ms)
+    return moveToNotation(move)
+
+
+class FairQueue:
+    # Round-robin over clients: each get() serves the next client that has work queued.
+    def __init__(self):
+        self._queues = {}
+        self._rotation = deque()
+        self._available = asyncio.Semaphore(0)
+
+    def put(self, client, job):
+        queue = self._queues.get(client)
+        if queue is None:
+            queue = self._queues[client] = deque()
+            self._rotation.append(client)
+        queue.append(job)
+        self._available.release()
+
+    def drop(self, client):
+        # Forget a disconnected client's pending jobs; their semaphore slots become no-ops.
+        if self._queues.pop(client, None) is not None:
+            self._rotation.remove(client)
+
+    async def get(self):
+        while True:
+            await self._available.acquire()
+            if not self._rotation:
+                continue  # Slot belonged to a dropped client.
+            client = self._rotation.popleft()
+            queue = self._queues[client]
+            job = queue.popleft()
+            if queue:
+                self._rotation.append(client)
+            else:
+                del self._queues[client]
+            return client, job
+
+
+class Client:
+    def __init__(self, name, writer):
+        self.name = name
+        self._writer = writer  # Callable taking one line of text.
+        self.closed = False
+        self.pending = 0  # Requests queued or running
+
+    def send(self, line):
+        if not self.closed:
+            self._writer(line + "\n")
+
+
+class EngineServer:
+    def __init__(self, workers=1, time_limit_ms=DEFAULT_TIME_MS):
+        self.workers = workers
+        self.time_limit_ms = time_limit_ms
+        self.queue = FairQueue()
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+
+    def handleLine(self, client, line):
+        # Returns False when the client asked to quit.
+        parts = line.split()
+        if not parts:
+            return True
+        command = parts[0]
+        if command == "quit":
+            return False
+        if command == "ping":
+            client.send("pong")
+        elif command == "go" and len(parts) >= 3:
+            options = dict(part.split("=", 1) for part in parts[3:] if "=" in part)
+            try:
+                time_limit_ms = int(options.get("ms", self.time_limit_ms))
+                iterations = int(options["iterations"]) if "iterations" in options else None
+            except ValueError:
+                client.send(f"error {parts[1]} bad option")
+                return True
+            client.pending += 1
+            self.queue.put(client, (parts[1], parts[2], time_limit_ms, iterations))
+        else:
+            client.send(f"error - unknown command: {line.strip()}")
+        return True
+
+    async def dispatch(self):
+        # One dispatcher per worker keeps exactly `workers` searches in flight.
+        loop = asyncio.get_running_loop()
+        while True:
+            client, (request_id, notation, time_limit_ms, iterations) = await self.queue.get()
+            try:
+                move = await loop.run_in_executor(self.executor, searchJob, notation, time_limit_ms, iterations)
+                client.send(f"bestmove {request_id} {move}")
+            except Exception as error:
+                client.send(f"error {request_id} {error}")
+            finally:
+                client.pending -= 1
+
+    async def serveStdio(self):
+        loop = asyncio.get_running_loop()
+        client = Client("stdio", lambda text: (sys.stdout.write(text), sys.stdout.flush()))
+        while True:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
+            if not line:
+                # End of input: answer what was already asked before shutting down.
+                while client.pending:
+                    await asyncio.sleep(0.05)
+                break
+            if not self.handleLine(client, line):
+                break
+        client.closed = True
+        self.queue.drop(client)
+
+    async def serveConnection(self, reader, writer):
+        client = Client(writer.get_extra_info("peername"), lambda text: writer.write(text.encode()))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line or not self.handleLine(client, line.decode(errors="replace")):
+                    break
+                await writer.drain()
+        finally:
+            client.closed = True
+            self.queue.drop(client)
+            writer.close()
+
+    async def run(self, stdio=True, host="127.0.0.1", port=None):
+        dispatchers = [asyncio.create_task(self.dispatch()) for _ in range(self.workers)]
+        server = None
+        if port is not None:
+            server = await asyncio.start_server(self.serveConnection, host, port)
+        try:
+            if stdio:
+                await self.serveStdio()
+            elif server is not None:
+                await server.serve_forever()
+        finally:
+            if server is not None:
+                server.close()
+            for task in dispatchers:
+                task.cancel()
+            self.executor.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Quoridor engine server")
+    parser.add_argument("--stdio", action="store_true", help="serve requests on stdin/stdout")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="also listen on this local TCP port")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--time-ms", type=int, default=DEFAULT_TIME_MS, help="default search budget per request")
+    args = parser.parse_args(argv)
+    if not args.stdio and args.port is None:
+        args.stdio = True
+
+    server = EngineServer(workers=args.workers, time_limit_ms=args.time_ms)
+    asyncio.run(server.run(stdio=args.stdio, host=args.host, port=args.port))
+
+
+if __name__ == "__main__":
+    main()